@@ -0,0 +1,226 @@
+"""
+Offline airport reference data: IATA code to timezone, coordinates and city,
+plus keyword search for autocomplete, with no Amadeus calls.
+
+data/airports.csv is compiled into data/airport_index.json at build time:
+
+    python airports.py
+
+If the compiled index is missing it is compiled from the CSV on first use.
+The index stores IANA timezone names; pytz supplies their UTC offset rules.
+"""
+import argparse
+import csv
+import json
+import logging
+import os
+import threading
+import unicodedata
+from bisect import bisect_left
+
+import pytz
+
+from config import AIRPORT_INDEX_PATH, AIRPORT_SOURCE_PATH
+
+logger = logging.getLogger(__name__)
+
+INDEX_VERSION = 1
+# Position of each field in a compiled airport record.
+_FIELDS = ("icao", "name", "city", "country", "latitude", "longitude", "timezone")
+# Share of the keyword's trigrams an airport must have to match a misspelled search.
+MIN_TRIGRAM_SIMILARITY = 0.4
+
+
+def normalize(text):
+    """Lower-case text with accents and punctuation dropped, e.g. "São Paulo" -> "sao paulo"."""
+    decomposed = unicodedata.normalize("NFKD", text)
+    letters = (char if char.isalnum() else " " for char in decomposed if not unicodedata.combining(char))
+    return " ".join("".join(letters).casefold().split())
+
+
+def trigrams(text):
+    """The three-letter slices of each word of normalized text, padded so word starts count."""
+    grams = set()
+    for word in text.split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def search_terms(iata, record):
+    """The normalized terms an airport can be found by: its codes, its city and every word of its names."""
+    icao, name, city = record[0], record[1], record[2]
+    terms = {iata.lower(), normalize(city)}
+    if icao:
+        terms.add(icao.lower())
+    terms.update(normalize(f"{name} {city}").split())
+    return terms
+
+
+def compile_index(rows):
+    """
+    Compile airport rows (dicts with the columns of data/airports.csv) into the
+    index layout: the records, a sorted term list for prefix search and the
+    airports behind each trigram.
+    """
+    airports = {}
+    for row in rows:
+        iata = row["iata"].strip().upper()
+        if len(iata) != 3:
+            continue
+        airports[iata] = [
+            row["icao"].strip().upper(), row["name"].strip(), row["city"].strip(), row["country"].strip(),
+            round(float(row["latitude"]), 4), round(float(row["longitude"]), 4), row["tz"].strip(),
+        ]
+
+    prefix_entries = sorted({(term, iata) for iata, record in airports.items() for term in search_terms(iata, record)})
+    trigram_index = {}
+    for iata, record in airports.items():
+        for gram in trigrams(normalize(f"{record[1]} {record[2]}")) | trigrams(iata.lower()):
+            trigram_index.setdefault(gram, []).append(iata)
+    return {
+        "version": INDEX_VERSION,
+        "airports": airports,
+        "terms": [term for term, _ in prefix_entries],
+        "term_airports": [iata for _, iata in prefix_entries],
+        "trigrams": {gram: sorted(codes) for gram, codes in sorted(trigram_index.items())},
+    }
+
+
+def read_source(path=AIRPORT_SOURCE_PATH):
+    with open(path, newline="", encoding="utf-8") as source:
+        return list(csv.DictReader(source))
+
+
+def build(source_path=AIRPORT_SOURCE_PATH, index_path=AIRPORT_INDEX_PATH):
+    """Compile the airport CSV into the JSON index file; returns the number of airports."""
+    index = compile_index(read_source(source_path))
+    with open(index_path, "w", encoding="utf-8") as output:
+        json.dump(index, output, ensure_ascii=False, separators=(",", ":"))
+    return len(index["airports"])
+
+
+class AirportIndex:
+    def __init__(self, compiled):
+        """
+        In-memory lookups over a compiled index.
+        :param compiled: The dict built by compile_index, or loaded from its JSON file.
+        """
+        self._airports = compiled["airports"]
+        self._terms = compiled["terms"]
+        self._term_airports = compiled["term_airports"]
+        self._trigrams = compiled["trigrams"]
+        self._timezones = {}
+        self._unknown = set()
+
+    def __len__(self):
+        return len(self._airports)
+
+    def get(self, iata):
+        """The airport for an IATA code as a dict, or None."""
+        iata = iata.upper()
+        record = self._airports.get(iata)
+        if record is None:
+            return None
+        return {"iata": iata, **dict(zip(_FIELDS, record))}
+
+    def __contains__(self, iata):
+        return iata.upper() in self._airports
+
+    def timezone(self, iata, default=pytz.utc):
+        """
+        The pytz timezone of an airport, or default for codes the index does not
+        know; each unknown code is logged once, as its times are then probably wrong.
+        """
+        tz = self._timezones.get(iata)
+        if tz is None:
+            record = self._airports.get(iata)
+            if record is None:
+                if iata not in self._unknown:
+                    self._unknown.add(iata)
+                    logger.warning("Airport %s is not in the airport index, using %s for its times", iata, default)
+                return default
+            tz = self._timezones[iata] = pytz.timezone(record[6])
+        return tz
+
+    def _prefix_matches(self, keyword):
+        """Airports with a search term starting with keyword, exact terms first."""
+        exact, partial = [], []
+        position = bisect_left(self._terms, keyword)
+        while position < len(self._terms) and self._terms[position].startswith(keyword):
+            iata = self._term_airports[position]
+            (exact if self._terms[position] == keyword else partial).append(iata)
+            position += 1
+        return exact + partial
+
+    def _trigram_matches(self, keyword):
+        """Airports sharing enough trigrams with keyword, most similar first."""
+        grams = trigrams(keyword)
+        if not grams:
+            return []
+        shared = {}
+        for gram in grams:
+            for iata in self._trigrams.get(gram, ()):
+                shared[iata] = shared.get(iata, 0) + 1
+        matches = [(count / len(grams), iata) for iata, count in shared.items()
+                   if count / len(grams) >= MIN_TRIGRAM_SIMILARITY]
+        return [iata for _, iata in sorted(matches, key=lambda match: (-match[0], match[1]))]
+
+    def search(self, keyword, limit=10):
+        """
+        Airports matching a keyword: exact codes, cities and name words first,
+        then ones starting with it; close misspellings only when nothing does.
+        """
+        keyword = normalize(keyword)
+        if not keyword:
+            return []
+        found = []
+        candidates = self._prefix_matches(keyword) or self._trigram_matches(keyword)
+        for iata in candidates:
+            if iata not in found:
+                found.append(iata)
+                if len(found) == limit:
+                    break
+        return [self.get(iata) for iata in found]
+
+
+def load_index(index_path=AIRPORT_INDEX_PATH, source_path=AIRPORT_SOURCE_PATH):
+    """Load the compiled index, compiling it from the CSV when it has not been built."""
+    if os.path.exists(index_path):
+        with open(index_path, encoding="utf-8") as index_file:
+            compiled = json.load(index_file)
+        if compiled.get("version") == INDEX_VERSION:
+            return AirportIndex(compiled)
+    logger.info("Airport index not built, compiling it from %s", source_path)
+    return AirportIndex(compile_index(read_source(source_path)))
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_airport_index():
+    """Return the process-wide AirportIndex, loading it on first use."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = load_index()
+    return _index
+
+
+def get_timezone(iata):
+    """The pytz timezone of an airport; UTC for airports not in the index."""
+    return get_airport_index().timezone(iata)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile the bundled airport data into its lookup index.")
+    parser.add_argument("--source", default=AIRPORT_SOURCE_PATH)
+    parser.add_argument("--output", default=AIRPORT_INDEX_PATH)
+    args = parser.parse_args()
+    print(f"Compiled {build(args.source, args.output)} airports into {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,65 @@
+import logging
+import random
+import threading
+import time
+
 import requests
-from config import AMADEUS_API_KEY, AMADEUS_API_SECRET, AMADEUS_BASE_URL
+from requests.adapters import HTTPAdapter
+
+from config import (
+    AMADEUS_API_KEY,
+    AMADEUS_API_SECRET,
+    AMADEUS_BACKOFF_BASE_SECONDS,
+    AMADEUS_BACKOFF_MAX_SECONDS,
+    AMADEUS_BASE_URL,
+    AMADEUS_MAX_RESULTS,
+    AMADEUS_MAX_RETRIES,
+    AMADEUS_POOL_SIZE,
+    AMADEUS_TIMEOUT_SECONDS,
+    AMADEUS_TOKEN_REFRESH_MARGIN_SECONDS,
+)
+from amadeus_errors import AmadeusError
+from circuit_breaker import CircuitOpenError, get_circuit_breaker
+from metrics import AMADEUS_REQUEST_SECONDS, AMADEUS_REQUESTS, AMADEUS_RESPONSE_BYTES
+from rate_limiter import DeadlineExceededError, QuotaExceededError, amadeus_scheduler
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+FLIGHT_OFFERS_PATH = "/v2/shopping/flight-offers"
+TOKEN_PATH = "/v1/security/oauth2/token"
+# Rate-limiter priority of token requests, which every queued search is waiting on.
+TOKEN_PRIORITY = 1000
+
+logger = logging.getLogger(__name__)
+
+
+def flight_offer_params(origin, destination, departure_date, currency="USD", max_results=AMADEUS_MAX_RESULTS,
+                        non_stop=False):
+    """Build the flight-offers query for one leg; non_stop asks Amadeus for non-stop offers only."""
+    params = {
+        "originLocationCode": origin,
+        "destinationLocationCode": destination,
+        "departureDate": departure_date,
+        "adults": 1,
+        "currencyCode": currency,
+        "max": max_results,
+    }
+    if non_stop:
+        params["nonStop"] = "true"
+    return params
+
+
+def flight_offer_query(params):
+    """Name of the planned query behind flight-offers params, as used in metric labels."""
+    return "nonstop" if params.get("nonStop") == "true" else "full"
 
 
 class AmadeusClient:
     def __init__(self):
-        """Initialize the Amadeus client."""
+        """
+        Initialize the Amadeus client.
+        All requests share one keep-alive connection pool and one access token,
+        which is fetched on first use and refreshed shortly before it expires.
+        """
         if not all([AMADEUS_API_KEY, AMADEUS_API_SECRET]):
             raise ValueError(
                 "❌ ERROR: AMADEUS_API_KEY and AMADEUS_API_SECRET must be set in the .env file."
@@ -13,19 +68,199 @@ class AmadeusClient:
         self.base_url = AMADEUS_BASE_URL
         self.api_key = AMADEUS_API_KEY
         self.api_secret = AMADEUS_API_SECRET
-        self.access_token = self._get_access_token()
 
-    def _get_access_token(self):
-        """Get the access token from the Amadeus API."""
-        url = f"{self.base_url}/v1/security/oauth2/token"
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=AMADEUS_POOL_SIZE)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self._token = None
+        self._token_expires_at = 0.0
+        self._token_lock = threading.Lock()
+
+    @property
+    def access_token(self):
+        return self._get_access_token()
+
+    def warm_up(self):
+        """Fetch an access token now, which also leaves a pooled connection to Amadeus open."""
+        self._get_access_token()
+
+    def _request_access_token(self):
+        """
+        Request a new access token and store it along with its expiry time.
+        Like every other request it passes the token endpoint's circuit breaker and
+        the rate limiter, where it goes ahead of the searches waiting on it.
+        """
         data = {
             "grant_type": "client_credentials",
             "client_id": self.api_key,
             "client_secret": self.api_secret,
         }
-        response = requests.post(url, data=data)
+        breaker = get_circuit_breaker(TOKEN_PATH)
+        breaker.before_call()
+        try:
+            with amadeus_scheduler.bind(priority=TOKEN_PRIORITY):
+                amadeus_scheduler.acquire()
+            response = self._send("POST", TOKEN_PATH, data=data)
+        except requests.RequestException:
+            breaker.record_failure()
+            raise
+        except BaseException:
+            breaker.release()
+            raise
+        if response.status_code in RETRYABLE_STATUS_CODES:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
         response.raise_for_status()
-        return response.json().get("access_token")
+        payload = response.json()
+        self._token = payload.get("access_token")
+        self._token_expires_at = time.monotonic() + float(payload.get("expires_in", 0))
+
+    def _send(self, method, path, timeout=AMADEUS_TIMEOUT_SECONDS, **kwargs):
+        """Send one HTTP request to Amadeus, recording its latency and status."""
+        started = time.perf_counter()
+        status = "error"
+        try:
+            response = self.session.request(method, f"{self.base_url}{path}", timeout=timeout, **kwargs)
+            status = response.status_code
+            return response
+        finally:
+            elapsed = time.perf_counter() - started
+            AMADEUS_REQUEST_SECONDS.observe(elapsed, endpoint=path)
+            AMADEUS_REQUESTS.inc(endpoint=path, status=str(status))
+            logger.debug("Amadeus %s %s -> %s in %.3fs", method, path, status, elapsed)
+
+    def _get_access_token(self):
+        """
+        Return a valid access token.
+        Inside the refresh margin one caller refreshes the token while the others
+        keep using the current one; only an expired or missing token blocks callers.
+        """
+        now = time.monotonic()
+        if self._token and now < self._token_expires_at - AMADEUS_TOKEN_REFRESH_MARGIN_SECONDS:
+            return self._token
+
+        if self._token and now < self._token_expires_at:
+            if self._token_lock.acquire(blocking=False):
+                try:
+                    if time.monotonic() >= self._token_expires_at - AMADEUS_TOKEN_REFRESH_MARGIN_SECONDS:
+                        self._request_access_token()
+                except (requests.RequestException, CircuitOpenError, QuotaExceededError,
+                        DeadlineExceededError) as error:
+                    logger.warning("Error refreshing Amadeus token, keeping the current one: %s", error)
+                finally:
+                    self._token_lock.release()
+            return self._token
+
+        with self._token_lock:
+            if not self._token or time.monotonic() >= self._token_expires_at:
+                self._request_access_token()
+            return self._token
+
+    def _invalidate_token(self, token):
+        with self._token_lock:
+            if self._token == token:
+                self._token = None
+                self._token_expires_at = 0.0
+
+    def _backoff(self, path, attempt, response=None):
+        """
+        Sleep before the next retry, honouring Retry-After when the API sends it.
+        Raises DeadlineExceededError instead when the retry could not start before
+        the search deadline.
+        """
+        delay = None
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after and retry_after.isdigit():
+                delay = float(retry_after)
+        if delay is None:
+            delay = random.uniform(0, AMADEUS_BACKOFF_BASE_SECONDS * (2 ** attempt))
+        delay = min(delay, AMADEUS_BACKOFF_MAX_SECONDS)
+        time_left = amadeus_scheduler.time_left()
+        if time_left is not None and delay >= time_left:
+            raise DeadlineExceededError(f"The search deadline passes before {path} could be retried.")
+        time.sleep(delay)
+
+    @staticmethod
+    def _request_timeout(path):
+        """The HTTP timeout of the next request, cut to what is left of the search deadline."""
+        time_left = amadeus_scheduler.time_left()
+        if time_left is None:
+            return AMADEUS_TIMEOUT_SECONDS
+        if time_left <= 0:
+            raise DeadlineExceededError(f"The search deadline passed before {path} was requested.")
+        return min(AMADEUS_TIMEOUT_SECONDS, time_left)
+
+    def _get(self, path, params):
+        """GET an Amadeus endpoint and return the decoded JSON body."""
+        return self._get_response(path, params).json()
+
+    def _get_response(self, path, params):
+        """
+        GET an Amadeus endpoint and return the successful response.
+        Every attempt first passes the endpoint's circuit breaker, which fails it
+        fast while the endpoint is down, then takes a slot from the shared rate
+        limiter. 429/5xx responses and connection errors are retried with
+        exponential backoff and jitter; a 401 triggers one token refresh.
+        Under a search deadline no attempt or retry starts after it and each
+        request times out by it, raising DeadlineExceededError.
+        """
+        breaker = get_circuit_breaker(path)
+        refreshed_token = False
+        attempt = 0
+        while True:
+            self._request_timeout(path)
+            try:
+                breaker.before_call()
+            except CircuitOpenError as error:
+                raise AmadeusError(str(error))
+            try:
+                token = self._get_access_token()
+            except (requests.RequestException, CircuitOpenError) as error:
+                breaker.release()
+                raise AmadeusError(f"Could not get an Amadeus access token: {error}")
+            except BaseException:
+                breaker.release()
+                raise
+            headers = {"Authorization": f"Bearer {token}"}
+            timeout = None
+            try:
+                amadeus_scheduler.acquire()
+                timeout = self._request_timeout(path)
+                response = self._send("GET", path, timeout=timeout, headers=headers, params=params)
+            except requests.RequestException as error:
+                if isinstance(error, requests.Timeout) and timeout < AMADEUS_TIMEOUT_SECONDS:
+                    # Cut short by the search deadline, which says nothing about the endpoint.
+                    breaker.release()
+                    raise DeadlineExceededError(f"The search deadline passed while waiting for {path}.")
+                breaker.record_failure()
+                if attempt >= AMADEUS_MAX_RETRIES:
+                    raise AmadeusError(f"{path} failed: {error}")
+                self._backoff(path, attempt)
+                attempt += 1
+                continue
+            except BaseException:
+                breaker.release()
+                raise
+
+            if response.status_code in RETRYABLE_STATUS_CODES:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+            if response.status_code == 401 and not refreshed_token:
+                self._invalidate_token(token)
+                refreshed_token = True
+                continue
+            if response.status_code in RETRYABLE_STATUS_CODES and attempt < AMADEUS_MAX_RETRIES:
+                self._backoff(path, attempt, response)
+                attempt += 1
+                continue
+            if not response.ok:
+                raise AmadeusError(f"{path} returned {response.status_code}: {response.text}", response.status_code)
+            return response
 
     def fetch_flights(self, origin, destination, departure_date):
         """
@@ -34,16 +269,18 @@ class AmadeusClient:
         :param destination: The destination location code. e.g. "JFK".
         :param departure_date: The departure date. e.g. "2022-12-01".
         """
-        url = f"{self.base_url}/v2/shopping/flight-offers"
-        headers = {"Authorization": f"Bearer {self.access_token}"}
         params = {
             "originLocationCode": origin,
             "destinationLocationCode": destination,
             "departureDate": departure_date,
             "adults": 1,
         }
-        response = requests.get(url, headers=headers, params=params)
-        response.raise_for_status()
+        return self._get(FLIGHT_OFFERS_PATH, params)
+
+    def search_flight_offers(self, params):
+        """Run a flight-offers search and return the raw Amadeus response body."""
+        response = self._get_response(FLIGHT_OFFERS_PATH, params)
+        AMADEUS_RESPONSE_BYTES.observe(len(response.content), query=flight_offer_query(params))
         return response.json()
 
     def fetch_airports(self, keyword):
@@ -51,12 +288,8 @@ class AmadeusClient:
         Fetch airports from the Amadeus API.
         :param keyword: The keyword to search for airports. e.g. "New York".
         """
-        url = f"{self.base_url}/v1/reference-data/locations"
-        headers = {"Authorization": f"Bearer {self.access_token}"}
         params = {"keyword": keyword, "subType": "CITY,AIRPORT"}
-        response = requests.get(url, headers=headers, params=params)
-        response.raise_for_status()
-        return response.json()
+        return self._get("/v1/reference-data/locations", params)
 
     def process_flight(self, flight, carriers):
         """Process a single flight entry."""
@@ -84,3 +317,16 @@ class AmadeusClient:
             ],
         }
         return processed_flight
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_amadeus_client():
+    """Return the process-wide AmadeusClient, creating it on first use."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = AmadeusClient()
+        return _client
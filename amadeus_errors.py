@@ -0,0 +1,26 @@
+"""
+Errors of Amadeus requests, kept apart from amadeus_client so the code that
+handles them can be imported without requests.
+"""
+
+# Rejections of the query itself, which come back the same however often it is sent.
+NO_SERVICE_STATUS_CODES = {400, 404}
+NO_SERVICE = "no_service"
+TRANSIENT = "transient"
+
+
+class AmadeusError(Exception):
+    """Raised when an Amadeus request fails after all retries."""
+
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+    @property
+    def kind(self):
+        """
+        "no_service" when Amadeus rejected the request itself, e.g. an unknown airport
+        or a date it does not sell, so asking again gets the same answer; otherwise
+        "transient", such as timeouts, 429/5xx responses or an open circuit.
+        """
+        return NO_SERVICE if self.status_code in NO_SERVICE_STATUS_CODES else TRANSIENT
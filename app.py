@@ -1,25 +1,52 @@
-import pytz
 import os
-import itertools
 import json
+import uuid
+import time
+import hashlib
 import datetime
-# import logging
-from flask import Flask, jsonify, request
+import logging
+from flask import Flask, Response, jsonify, request, stream_with_context
 from flask_cors import CORS
-from dotenv import load_dotenv
+from contextlib import contextmanager
 from datetime import datetime as dt
-from withstops import WithStops
-from directonly import DirectFlight
+from engines import get_engine
+from airports import get_airport_index, get_timezone
 from email_flights_data import EmailFlightData
+from email_queue import email_queue
+from cache import offer_cache, result_cache
+from cache_warmer import search_popularity
+from destinations import CONTINENT_LAYERS, buffer_hours
+from search_engine import anytime_search, find_best_itinerary, stream_search_events
+from prefetch import prefetch_searches
+from query_planner import fetch_order
+from ranking import OBJECTIVES, Objective, rank_itineraries
+from config import (
+    BATCH_MAX_QUERIES,
+    RANKING_COST_WEIGHT,
+    RANKING_MAX_TOP_K,
+    RANKING_TIME_WEIGHT,
+    RESULT_CACHE_TIME_BUCKET_MINUTES,
+    SEARCH_DEADLINE_MS,
+    SEARCH_DEADLINE_RESERVE_MS,
+)
+from rate_limiter import DeadlineExceededError, QuotaExceededError, amadeus_scheduler
+from amadeus_errors import AmadeusError
+from search_jobs import JobQueueFullError, SearchJobManager
+from logging_config import configure_logging
+from serialization import JSON_MIMETYPE, available_mimetypes, negotiate
+from metrics import (
+    CACHE_ENTRIES,
+    CACHE_HIT_RATIO,
+    CACHE_HITS,
+    CACHE_MISSES,
+    CONTENT_TYPE,
+    SEARCH_AMADEUS_CALLS,
+    SEARCH_SECONDS,
+    registry,
+)
 
-south_america_destinations = ["SCL"]
-north_america_destinations = ["MIA", "PTY", "LAX", "SFO", "SAN", "TIJ"]
-europe_destinations = ["MAD", "LIS", "BCN", "ORY", "CMN"]
-africa_destinations = ["CMN", "CAI"]
-asia_destinations = ["DOH", "DXB", "KUL"]
-australia_destinations = ["PER"]
-
-load_dotenv()
+configure_logging()
+logger = logging.getLogger(__name__)
 app = Flask(__name__)
 CORS(app)
 
@@ -37,116 +64,676 @@ def health_check():
     return jsonify({"status": "UP"})
 
 
-@app.route("/api/flights", methods=["GET"])
-def fetch_flights():
-    start_origin = request.args.get("start_origin")
-    departure_date = request.args.get("departure_date")
-    departure_time = request.args.get("departure_time")
-    flight_type = request.args.get("flight_type", "direct")  # direct or stops
-    email = request.args.get("email", None)
+@app.route("/api/airports", methods=["GET"])
+def search_airports():
+    """Airport and city autocomplete from the bundled airport index, without calling Amadeus."""
+    keyword = request.args.get("keyword", "").strip()
+    if not keyword:
+        return jsonify({"status": "FAILED", "message": "keyword is required."}), 400
+    try:
+        limit = min(max(int(request.args.get("limit", 10)), 1), 50)
+    except ValueError:
+        return jsonify({"status": "FAILED", "message": "limit must be an integer."}), 400
+    return jsonify({"status": "SUCCESS", "data": get_airport_index().search(keyword, limit)})
+
+
+@app.route("/api/quota", methods=["GET"])
+def quota_usage():
+    return jsonify({"status": "SUCCESS", "data": amadeus_scheduler.usage()})
+
+
+def collect_cache_metrics():
+    for name, cache in (("offers", offer_cache), ("results", result_cache)):
+        stats = cache.stats()
+        CACHE_HITS.set(stats["hits"], cache=name)
+        CACHE_MISSES.set(stats["misses"], cache=name)
+        CACHE_HIT_RATIO.set(stats["hit_ratio"], cache=name)
+        CACHE_ENTRIES.set(stats["size"], cache=name)
+
+
+registry.add_collector(collect_cache_metrics)
+
+
+@app.route("/api/metrics", methods=["GET"])
+def metrics():
+    return Response(registry.render(), content_type=CONTENT_TYPE)
+
+
+@app.errorhandler(QuotaExceededError)
+def quota_exceeded(error):
+    return jsonify({"status": "FAILED", "message": str(error)}), 503
+
+
+@app.errorhandler(AmadeusError)
+def amadeus_unavailable(error):
+    # A leg Amadeus failed to answer may have held the best flight, so there is no result to give.
+    logger.warning("Search failed on an Amadeus error: %s", error)
+    return jsonify({"status": "FAILED", "message": "Flight data is temporarily unavailable, please retry."}), 503
+
 
+FLIGHT_TYPES = ("direct", "stops", "both")
+STRING_SEARCH_FIELDS = ("start_origin", "departure_date", "departure_time", "flight_type", "email", "objective")
+
+
+def parse_search_params(args):
+    """
+    Validate the search arguments shared by /api/flights and /api/searches.
+    Returns (params, None) on success or (None, error_message).
+    """
+    # JSON bodies (/api/searches, /api/flights/batch) can hold any type, query strings only strings.
+    for field in STRING_SEARCH_FIELDS:
+        if args.get(field) is not None and not isinstance(args.get(field), str):
+            return None, f"{field} must be a string."
+
+    start_origin = (args.get("start_origin") or "").strip().upper()
+    departure_date = args.get("departure_date")
+    departure_time = args.get("departure_time")
+    flight_type = args.get("flight_type", "direct")  # direct, stops or both
+    email = args.get("email", None)
+    objective = args.get("objective", "time")  # time, cost or weighted
+    pareto = str(args.get("pareto", "false")).lower() in ("1", "true", "yes")
+
+    if not start_origin:
+        return None, "start_origin is required."
+    if start_origin not in get_airport_index():
+        # Its local time, and so every departure of the search, would be guessed.
+        return None, f"Unknown airport code {start_origin!r}. Use the IATA code of an airport in /api/airports."
+    if start_origin not in buffer_hours:
+        # The first connection needs the origin's buffer time, which only these airports have.
+        return None, f"Searches cannot start from {start_origin}. Start from one of: {', '.join(sorted(buffer_hours))}."
     try:
         current_time = dt.strptime(
             f"{departure_date} {departure_time}", "%Y-%m-%d %H:%M"
         )
-        current_time = pytz.utc.localize(current_time)
+        # The departure time is local to the origin airport.
+        current_time = get_timezone(start_origin).localize(current_time)
     except ValueError:
-        return jsonify(
-            {
-                "status": "FAILED",
-                "message": "Invalid date or time format. Please use YYYY-MM-DD for date and HH:MM for time.",
-            }
-        )
+        return None, "Invalid date or time format. Please use YYYY-MM-DD for date and HH:MM for time."
 
-    all_sequences = list(
-        itertools.product(
-            south_america_destinations,
-            north_america_destinations,
-            europe_destinations,
-            africa_destinations,
-            asia_destinations,
-            australia_destinations,
-        )
-    )
-    valid_itineraries = []
-    sequence_count = 0
+    # flight_type labels metrics and keys the result cache, so it must be one of a few known values.
+    if flight_type not in FLIGHT_TYPES:
+        return None, f"Invalid flight_type. Use one of: {', '.join(FLIGHT_TYPES)}."
+    if objective not in OBJECTIVES:
+        return None, f"Invalid objective. Use one of: {', '.join(OBJECTIVES)}."
+    try:
+        top_k = int(args.get("top_k", 1))
+        time_weight = float(args.get("time_weight", RANKING_TIME_WEIGHT))
+        cost_weight = float(args.get("cost_weight", RANKING_COST_WEIGHT))
+    except (TypeError, ValueError):
+        return None, "top_k must be an integer and time_weight/cost_weight must be numbers."
+    try:
+        deadline_ms = int(args.get("deadline_ms", SEARCH_DEADLINE_MS))
+    except (TypeError, ValueError):
+        return None, "deadline_ms must be an integer."
+    if deadline_ms < 0:
+        return None, "deadline_ms must not be negative."
+    if not 1 <= top_k <= RANKING_MAX_TOP_K:
+        return None, f"top_k must be between 1 and {RANKING_MAX_TOP_K}."
+    if time_weight < 0 or cost_weight < 0:
+        return None, "time_weight and cost_weight must not be negative."
+
+    return {
+        "start_origin": start_origin,
+        "departure_date": departure_date,
+        "departure_time": departure_time,
+        "flight_type": flight_type,
+        "email": email,
+        "current_time": current_time,
+        "objective": objective,
+        "top_k": top_k,
+        "pareto": pareto,
+        "time_weight": time_weight,
+        "cost_weight": cost_weight,
+        "deadline_ms": deadline_ms,
+    }, None
+
+
+def search_objective(params):
+    return Objective(params["objective"], time_weight=params["time_weight"], cost_weight=params["cost_weight"])
 
-    flight_instance = None
 
+def uses_ranking(params):
+    """Plain fastest-itinerary searches keep the layered search; anything else goes through ranking."""
+    return params["objective"] != "time" or params["top_k"] > 1 or params["pareto"]
+
+
+def flight_modes(flight_type):
+    """Return the leg filters a flight_type runs; "both" runs direct and stops over one set of fetches."""
+    if flight_type == "both":
+        return ["direct", "stops"]
     if flight_type == "direct":
-        flight_instance = DirectFlight()
-    else:
-        flight_instance = WithStops()
-
-    # Check each full sequence
-    for sequence in all_sequences:
-        sequence_count += 1
-        # if sequence_count == 60:
-        #     break
-        print(f"\nChecking sequence {sequence_count}: {sequence}")
-        itinerary = flight_instance.simulate_itinerary(
-            start_origin, sequence, current_time
-        )
-        if itinerary:
-            print("Itinerary found:")
-            for flight in itinerary["flights"]:
-                layover_str = (
-                    f" | Layover in {flight['layover_iata']}: {flight['layover']}"
-                    if flight.get("layover")
-                    else ""
+        return ["direct"]
+    return ["stops"]
+
+
+def itinerary_json_string(itinerary):
+    """v1 responses carry each itinerary as a JSON string inside the JSON response."""
+    return json.dumps(itinerary, default=serialize_datetime)
+
+
+def native_itinerary(itinerary):
+    """v2 responses keep the itinerary as a nested object and encode it once with the response."""
+    return itinerary
+
+
+def format_result(result, encode_itinerary=itinerary_json_string):
+    """Turn a (best_sequence, best_itinerary) result into response data."""
+    best_sequence, best_itinerary = result
+
+    logger.debug("Best sequence: %s", best_sequence)
+    logger.debug("Best itinerary: %s", best_itinerary)
+
+    return {"best_sequence": best_sequence, "best_itinerary": encode_itinerary(best_itinerary)}
+
+
+def format_ranking(ranking, encode_itinerary=itinerary_json_string):
+    """Turn a rank_itineraries result into response data, led by its best itinerary."""
+    def entries(items):
+        return [{"sequence": sequence, "itinerary": encode_itinerary(itinerary)} for sequence, itinerary in items]
+
+    data = format_result(ranking["ranked"][0], encode_itinerary)
+    data["ranked"] = entries(ranking["ranked"])
+    if ranking["pareto"] is not None:
+        data["pareto_frontier"] = entries(ranking["pareto"])
+    data["sequences_pruned"] = ranking["sequences_pruned"]
+    return data
+
+
+def search_deadline(deadline_ms):
+    """The time.monotonic() deadline of a search given deadline_ms, keeping back the response reserve; None for 0."""
+    if not deadline_ms:
+        return None
+    return time.monotonic() + max(0, deadline_ms - SEARCH_DEADLINE_RESERVE_MS) / 1000
+
+
+def compute_search(params, progress=None):
+    """
+    Find the best itinerary for validated search params.
+    Returns (results, best, coverage): the result of each flight mode, to be turned
+    into response data by format_search, the overall best (sequence, itinerary), or
+    None when no sequence is feasible, and the anytime_search or rank_itineraries
+    coverage of each mode that ran under the search's deadline_ms.
+    """
+    modes = flight_modes(params["flight_type"])
+    objective = search_objective(params)
+    ranked = uses_ranking(params)
+    # Results keep the display order of modes whatever order they run in.
+    results = dict.fromkeys(modes)
+    coverage = {}
+    search_id = uuid.uuid4().hex
+    started = time.perf_counter()
+    deadline = search_deadline(params["deadline_ms"])
+
+    with amadeus_scheduler.bind(search_id=search_id), finished_search(search_id, params, started):
+        for position, mode in enumerate(fetch_order(modes)):
+            mode_progress = None
+            if progress:
+                def mode_progress(evaluated, total, best, offset=position):
+                    progress(offset * total + evaluated, len(modes) * total, best)
+
+            if ranked:
+                ranking = rank_itineraries(
+                    get_engine(mode), params["start_origin"], CONTINENT_LAYERS, params["current_time"],
+                    objective=objective, top_k=params["top_k"], pareto=params["pareto"], progress=mode_progress,
+                    deadline=deadline
                 )
-                print(
-                    f"{flight['origin']} -> {flight['destination']} | {flight['airline']} {flight['flight_number']} | "
-                    f"Departure: {flight['departure_time']} | Arrival: {flight['arrival_time']} | Duration: {flight['duration']} | "
-                    f"Cost: ${flight['cost']}{layover_str}"
+                results[mode] = ranking if ranking["ranked"] else None
+                if deadline is not None:
+                    coverage[mode] = ranking["coverage"]
+            elif deadline is not None:
+                results[mode], coverage[mode] = anytime_search(
+                    get_engine(mode), params["start_origin"], CONTINENT_LAYERS, params["current_time"], deadline
+                )
+            else:
+                results[mode] = find_best_itinerary(
+                    get_engine(mode), params["start_origin"], CONTINENT_LAYERS, params["current_time"],
+                    progress=mode_progress
                 )
-            print(f"Total Flight Duration: {itinerary['total_flight_duration']}")
-            print(f"Total Layover Duration: {itinerary['total_layover_duration']}")
-            print(f"Total Travel Time: {itinerary['total_travel_time']}")
-            print(f"Total Flight Cost: ${itinerary['total_cost']:.2f}")
-            valid_itineraries.append((sequence, itinerary))
-        else:
-            print("No valid itinerary for this sequence.")
-
-    # Determine the best itinerary (shortest total travel time) among valid ones.
-    if valid_itineraries:
-        best_sequence, best_itinerary = min(
-            valid_itineraries, key=lambda x: x[1]["total_travel_time"]
-        )
 
-        print(
-            "::::::::::::::::::::::::::::::best sequence:::::::::::::::::::::::::::::::::::::::"
-        )
-        print(best_sequence)
+    logger.debug("Offer cache stats", extra=offer_cache.stats())
 
-        print(
-            "::::::::::::::::::::::::::::::best itinerary:::::::::::::::::::::::::::::::::::::::"
-        )
-        print(best_itinerary)
+    found = [result["ranked"][0] if ranked else result for result in results.values() if result]
+    if not found:
+        return results, None, coverage
+    return results, min(found, key=lambda x: objective.itinerary_score(x[1])), coverage
 
-        best_itinerary = json.dumps(best_itinerary, default=serialize_datetime)
 
-        if email:
-            email_data = EmailFlightData()
-            subject = "Flight Itinerary"
-            email_content = email_data.format_email_content(best_sequence, best_itinerary)
-            email_data.send_mail(email, subject, email_content)
-            print(f"Email sent successfully: {email}")
+def format_search(params, results, encode_itinerary=itinerary_json_string):
+    """
+    Turn compute_search results into response data, or None when nothing was found.
+    With flight_type "both" the data holds a "direct" and a "stops" result.
+    Searches with a ranking objective, top_k or pareto also return the ranked
+    alternatives and the Pareto frontier.
+    """
+    if not any(results.values()):
+        return None
 
-        return jsonify(
-            {
-                "status": "SUCCESS",
-                "data": {"best_sequence": best_sequence, "best_itinerary": best_itinerary},
-            }
+    def format_mode_result(result):
+        if uses_ranking(params):
+            return format_ranking(result, encode_itinerary)
+        return format_result(result, encode_itinerary)
+
+    if len(results) == 1:
+        return format_mode_result(next(iter(results.values())))
+    return {mode: format_mode_result(result) if result else None for mode, result in results.items()}
+
+
+def run_search(params, progress=None):
+    """
+    Find the best itinerary for validated search params and email it if requested.
+    Returns the response data dict, or None when no sequence is feasible.
+    """
+    results, best, _ = compute_search(params, progress)
+    if best and params["email"]:
+        send_best_itinerary(params["email"], best)
+    return format_search(params, results)
+
+
+def send_best_itinerary(email, best):
+    best_sequence, best_itinerary = best
+    send_itinerary_email(email, best_sequence, best_itinerary)
+
+
+@contextmanager
+def finished_search(search_id, params, started):
+    """Record the duration, Amadeus call count and origin of a search once the block exits."""
+    outcome = "failed"
+    try:
+        yield
+        outcome = "finished"
+    finally:
+        duration = time.perf_counter() - started
+        calls = amadeus_scheduler.pop_search_calls(search_id)
+        flight_type = params["flight_type"]
+        SEARCH_SECONDS.observe(duration, flight_type=flight_type)
+        SEARCH_AMADEUS_CALLS.observe(calls, flight_type=flight_type)
+        search_popularity.record(params["start_origin"])
+        logger.info(
+            "Search %s", outcome,
+            extra={"search_id": search_id, "flight_type": flight_type, "start_origin": params["start_origin"],
+                   "departure_date": params["departure_date"], "duration_ms": round(duration * 1000),
+                   "amadeus_calls": calls},
         )
+
+
+def send_itinerary_email(email, best_sequence, best_itinerary):
+    """Queue an itinerary email to the given address; delivery happens in the background."""
+    subject = "Flight Itinerary"
+    email_content = EmailFlightData().render_itinerary(best_sequence, best_itinerary)
+    email_queue.enqueue(email, subject, email_content)
+
+
+def search_payload(data, coverage=None):
+    """
+    The response body of a search. With the coverage from compute_search it also
+    says whether the search finished within its deadline.
+    """
+    if data:
+        payload = {"status": "SUCCESS", "data": data}
+    elif coverage and any(mode_coverage["stopped_by"] == "deadline" for mode_coverage in coverage.values()):
+        payload = {
+            "status": "FAILED",
+            "message": "The search deadline was reached before any itinerary was found.",
+        }
+    elif coverage and any(mode_coverage["stopped_by"] == "amadeus_error" for mode_coverage in coverage.values()):
+        payload = {
+            "status": "FAILED",
+            "message": "Flight data is temporarily unavailable, so the search stopped before any itinerary was found.",
+        }
     else:
-        return jsonify(
-            {
-                "status": "FAILED",
-                "message": "No valid itineraries were found across all sequences.",
-            }
-        )
-    
+        payload = {
+            "status": "FAILED",
+            "message": "No valid itineraries were found across all sequences.",
+        }
+    if coverage:
+        payload["complete"] = all(mode_coverage["complete"] for mode_coverage in coverage.values())
+        payload["coverage"] = next(iter(coverage.values())) if len(coverage) == 1 else coverage
+    return payload
+
+
+def search_response(data):
+    return jsonify(search_payload(data))
+
+
+def bucket_search_params(params, bucket_minutes=RESULT_CACHE_TIME_BUCKET_MINUTES):
+    """
+    Round the departure time up to the next multiple of bucket_minutes, so nearby
+    searches share one cached result. Rounding up keeps every flight in the result
+    reachable for the original time.
+    """
+    if bucket_minutes <= 1:
+        return params
+    current_time = params["current_time"]
+    minutes = current_time.hour * 60 + current_time.minute
+    rounded = current_time + datetime.timedelta(minutes=-minutes % bucket_minutes)
+    return {
+        **params,
+        "departure_date": rounded.strftime("%Y-%m-%d"),
+        "departure_time": rounded.strftime("%H:%M"),
+        "current_time": rounded,
+    }
+
+
+def result_cache_key(params):
+    """Everything that changes a search result; the email address does not."""
+    return (
+        params["start_origin"],
+        params["departure_date"],
+        params["departure_time"],
+        params["flight_type"],
+        params["objective"],
+        params["top_k"],
+        params["pareto"],
+        params["time_weight"],
+        params["cost_weight"],
+    )
+
+
+def v1_body(params, results, coverage=None):
+    return app.json.dumps(search_payload(format_search(params, results), coverage)).encode("utf-8")
+
+
+def v2_body(dumps):
+    """Build the v2 body encoder for a serializer, e.g. dumps_json or dumps_msgpack."""
+    def encode(params, results, coverage=None):
+        return dumps(search_payload(format_search(params, results, native_itinerary), coverage))
+    return encode
+
+
+def cached_search_entry(params):
+    """
+    Return (entry, computed) for bucketed search params: the result cache entry,
+    computing it on a miss, and whether this call computed it. Emails the best
+    itinerary when the search asks for it. A result cut short by its deadline is
+    handed to the requests already waiting for it but not kept.
+    """
+    computed = []
+
+    def load():
+        computed.append(True)
+        results, best, coverage = compute_search(params)
+        return {
+            "results": results,
+            "best": best,
+            "coverage": coverage,
+            "complete": all(mode_coverage["complete"] for mode_coverage in coverage.values()),
+            "bodies": {},
+            "expires_at": time.monotonic() + result_cache.ttl_seconds,
+        }
+
+    key = result_cache_key(params)
+    entry = result_cache.get_or_load(key, load)
+    if computed and not entry["complete"]:
+        result_cache.discard(key)
+    logger.debug("Result cache stats", extra=result_cache.stats())
+
+    if entry["best"] and params["email"]:
+        send_best_itinerary(params["email"], entry["best"])
+    return entry, bool(computed)
+
+
+def cached_search_response(params, representation="v1", mimetype=JSON_MIMETYPE, encode_body=v1_body):
+    """
+    Answer a search from the result cache. Concurrent identical searches wait for
+    one computation; the response carries an ETag and a Cache-Control max-age for
+    what is left of the entry's TTL, and a matching If-None-Match gets a 304.
+    An entry keeps the search results once and encodes each representation
+    (v1, v2 JSON, v2 MessagePack) the first time it is asked for.
+    """
+    params = bucket_search_params(params)
+    entry, computed = cached_search_entry(params)
+
+    encoded = entry["bodies"].get(representation)
+    if encoded is None:
+        body = encode_body(params, entry["results"], entry["coverage"])
+        encoded = entry["bodies"][representation] = (body, hashlib.sha1(body).hexdigest())
+    body, etag = encoded
+
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(body, mimetype=mimetype)
+    response.set_etag(etag)
+    # Accept picks the representation here and, on /api/flights, streaming instead of JSON.
+    response.vary.add("Accept")
+    if params["email"] or not entry["complete"]:
+        # The email is a side effect and a partial result should be retried, so
+        # shared caches must not answer for us.
+        response.headers["Cache-Control"] = "no-store"
+    else:
+        max_age = max(0, int(entry["expires_at"] - time.monotonic()))
+        response.headers["Cache-Control"] = f"public, max-age={max_age}"
+    response.headers["X-Cache"] = "MISS" if computed else "HIT"
+    return response
+
+
+STREAM_MIMETYPES = {"ndjson": "application/x-ndjson", "sse": "text/event-stream"}
+
+
+def requested_stream_format():
+    """Return "ndjson" or "sse" if the client asked for a streamed response, else None."""
+    stream = request.args.get("stream")
+    if stream in STREAM_MIMETYPES:
+        return stream
+    accept = request.headers.get("Accept", "")
+    for stream_format, mimetype in STREAM_MIMETYPES.items():
+        if mimetype in accept:
+            return stream_format
+    return None
+
+
+def stream_search(params, stream_format):
+    """
+    Stream search events as NDJSON lines or Server-Sent Events while sequences are evaluated.
+    A mode whose legs Amadeus fails to answer ends with an "error" event instead of "done".
+    """
+    def generate():
+        search_id = uuid.uuid4().hex
+        with finished_search(search_id, params, time.perf_counter()):
+            yield from generate_events(search_id)
+
+    def generate_events(search_id):
+        for mode in fetch_order(flight_modes(params["flight_type"])):
+            events = stream_search_events(
+                get_engine(mode), params["start_origin"], CONTINENT_LAYERS, params["current_time"]
+            )
+            while True:
+                # Bind only while computing the next event, never across a yield to the server.
+                try:
+                    with amadeus_scheduler.bind(search_id=search_id):
+                        event = next(events, None)
+                except AmadeusError as error:
+                    logger.warning("Streamed search failed on an Amadeus error: %s", error)
+                    # The failed generator is finished, so the next mode, if any, runs on.
+                    event = {"event": "error", "message": "Flight data is temporarily unavailable, please retry."}
+                if event is None:
+                    break
+                event["flight_type"] = mode
+                payload = json.dumps(event, default=serialize_datetime)
+                if stream_format == "sse":
+                    yield f"event: {event['event']}\ndata: {payload}\n\n"
+                else:
+                    yield payload + "\n"
+
+                if event["event"] == "done" and event["best_itinerary"] and params["email"]:
+                    send_itinerary_email(params["email"], event["best_sequence"], event["best_itinerary"])
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype=STREAM_MIMETYPES[stream_format],
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.route("/api/flights", methods=["GET"])
+def fetch_flights():
+    params, error = parse_search_params(request.args)
+    if error:
+        return jsonify({"status": "FAILED", "message": error}), 400
+
+    stream_format = requested_stream_format()
+    if stream_format:
+        return stream_search(params, stream_format)
+
+    return cached_search_response(params)
+
+
+@app.route("/api/v2/flights", methods=["GET"])
+def fetch_flights_v2():
+    """
+    Same search as /api/flights, with itineraries as nested objects instead of JSON
+    strings, durations in integer seconds and times as ISO 8601 strings. Send
+    Accept: application/msgpack for MessagePack when msgpack is installed.
+    """
+    mimetype, dumps = negotiate(request.accept_mimetypes)
+    if mimetype is None:
+        message = f"Supported response types: {', '.join(available_mimetypes())}."
+        return jsonify({"status": "FAILED", "message": message}), 406
+
+    params, error = parse_search_params(request.args)
+    if error:
+        return Response(dumps({"status": "FAILED", "message": error}), status=400, mimetype=mimetype)
+
+    return cached_search_response(params, f"v2:{mimetype}", mimetype, v2_body(dumps))
+
+
+def prefetch_batch(batch_params):
+    """
+    Fetch the legs of every uncached search in a batch together, one layer at a
+    time per flight mode, so legs shared between searches are fetched once.
+    """
+    pending = [params for params in batch_params if not result_cache.contains(result_cache_key(params))]
+    for mode in fetch_order(("direct", "stops")):
+        starts = {
+            (params["start_origin"], params["current_time"])
+            for params in pending if mode in flight_modes(params["flight_type"])
+        }
+        if starts:
+            prefetch_searches(get_engine(mode), starts, CONTINENT_LAYERS)
+
+
+@app.route("/api/flights/batch", methods=["POST"])
+def fetch_flights_batch():
+    """
+    Run many /api/flights searches in one request. The body is {"queries": [...]}
+    with each query holding the /api/flights parameters; data holds one result per
+    query, in order, shaped like the /api/flights response.
+    """
+    body = request.get_json(silent=True)
+    queries = body.get("queries") if isinstance(body, dict) else None
+    if not isinstance(queries, list) or not queries:
+        return jsonify({"status": "FAILED", "message": 'Send a JSON body with a non-empty "queries" list.'}), 400
+    if len(queries) > BATCH_MAX_QUERIES:
+        return jsonify({"status": "FAILED", "message": f"A batch holds at most {BATCH_MAX_QUERIES} queries."}), 400
+
+    parsed = [
+        parse_search_params(query) if isinstance(query, dict) else (None, "Each query must be an object.")
+        for query in queries
+    ]
+    batch_params = [bucket_search_params(params) if params else None for params, _ in parsed]
+
+    # The whole batch answers within the longest deadline_ms of its queries, not one deadline after another.
+    valid_params = [params for params in batch_params if params]
+    batch_deadline_ms = 0
+    if valid_params and all(params["deadline_ms"] for params in valid_params):
+        batch_deadline_ms = max(params["deadline_ms"] for params in valid_params)
+
+    batch_id = uuid.uuid4().hex
+    started = time.perf_counter()
+    with amadeus_scheduler.bind(search_id=batch_id, deadline=search_deadline(batch_deadline_ms)):
+        try:
+            prefetch_batch(valid_params)
+        except DeadlineExceededError:
+            logger.info("Batch prefetch stopped at the batch deadline", extra={"batch_id": batch_id})
+    logger.info(
+        "Batch prefetch finished",
+        extra={"queries": len(queries), "amadeus_calls": amadeus_scheduler.pop_search_calls(batch_id),
+               "duration_ms": round((time.perf_counter() - started) * 1000)},
+    )
+
+    data = []
+    for params, (_, error) in zip(batch_params, parsed):
+        if error:
+            data.append({"status": "FAILED", "message": error})
+            continue
+        if batch_deadline_ms:
+            left_ms = batch_deadline_ms - round((time.perf_counter() - started) * 1000)
+            params = {**params, "deadline_ms": max(1, min(params["deadline_ms"], left_ms))}
+        try:
+            entry, _ = cached_search_entry(params)
+        except AmadeusError as error:
+            logger.warning("Batch query failed on an Amadeus error: %s", error)
+            data.append({"status": "FAILED", "message": "Flight data is temporarily unavailable, please retry."})
+            continue
+        data.append(search_payload(format_search(params, entry["results"]), entry["coverage"]))
+    return jsonify({"status": "SUCCESS", "data": data})
+
+
+search_jobs = SearchJobManager(run_search)
+
+
+def serialize_job(job):
+    job_data = {
+        "job_id": job.id,
+        "status": job.status,
+        "progress": {
+            "sequences_evaluated": job.evaluated,
+            "sequences_total": job.total,
+        },
+        "best_so_far": None,
+    }
+    if job.best:
+        best_sequence, best_itinerary = job.best
+        job_data["best_so_far"] = {
+            "best_sequence": best_sequence,
+            "best_itinerary": json.dumps(best_itinerary, default=serialize_datetime),
+        }
+    if job.error:
+        job_data["error"] = job.error
+    return job_data
+
+
+@app.route("/api/searches", methods=["POST"])
+def submit_search():
+    args = request.get_json(silent=True) or request.args
+    params, error = parse_search_params(args)
+    if error:
+        return jsonify({"status": "FAILED", "message": error}), 400
+    # Background jobs exist for searches that should run to completion.
+    params["deadline_ms"] = 0
+
+    # Identical searches share a job, but the email each one asks for is part of the job.
+    key = result_cache_key(params) + (params["email"],)
+    try:
+        job, created = search_jobs.submit(key, params)
+    except JobQueueFullError as error:
+        return jsonify({"status": "FAILED", "message": str(error)}), 503
+
+    response = jsonify({"status": "ACCEPTED", "data": serialize_job(job)})
+    response.status_code = 202 if created else 200
+    response.headers["Location"] = f"/api/searches/{job.id}"
+    return response
+
+
+@app.route("/api/searches/<job_id>", methods=["GET"])
+def get_search(job_id):
+    job = search_jobs.get(job_id)
+    if job is None:
+        return jsonify({"status": "FAILED", "message": "Search job not found."}), 404
+    return jsonify({"status": "SUCCESS", "data": serialize_job(job)})
+
+
+@app.route("/api/searches/<job_id>/result", methods=["GET"])
+def get_search_result(job_id):
+    job = search_jobs.get(job_id)
+    if job is None:
+        return jsonify({"status": "FAILED", "message": "Search job not found."}), 404
+    if not job.done:
+        return jsonify({"status": "PENDING", "data": serialize_job(job)}), 202
+    if job.status == "failed":
+        return jsonify({"status": "FAILED", "message": job.error}), 500
+    return search_response(job.result)
+
 
 @app.route("/api/tests", methods=["GET"])
 def test():
@@ -241,4 +828,3 @@ def test():
 
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=5000, debug=True)
-    # logging.basicConfig(level=logging.DEBUG)
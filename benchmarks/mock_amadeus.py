@@ -0,0 +1,253 @@
+"""
+Local stand-in for the Amadeus endpoints the app uses.
+
+Serves /v1/security/oauth2/token and /v2/shopping/flight-offers with a
+deterministic synthetic timetable, configurable latency and injected errors,
+and counts every request so benchmarks can report call volumes.
+
+Run standalone with:
+    python benchmarks/mock_amadeus.py --port 8088 --latency-ms 150
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+CARRIERS = ["LA", "AA", "IB", "TP", "AT", "MS", "QR", "EK", "MH", "QF", "UX", "AF"]
+
+
+class Timetable:
+    def __init__(self, seed=0, flights_per_day=6, no_service_rate=0.15, stops_rate=0.2, connection_rate=0.2):
+        """
+        Deterministic synthetic flight offers, generated per (origin, destination, date).
+        :param seed: Changes every generated timetable.
+        :param flights_per_day: Upper bound on offers per leg and day.
+        :param no_service_rate: Share of legs with no offers at all.
+        :param stops_rate: Share of single-segment offers with a technical stop.
+        :param connection_rate: Share of offers made of two segments.
+        """
+        self.seed = seed
+        self.flights_per_day = flights_per_day
+        self.no_service_rate = no_service_rate
+        self.stops_rate = stops_rate
+        self.connection_rate = connection_rate
+
+    def offers(self, origin, destination, departure_date, currency="USD"):
+        rng = random.Random(f"{self.seed}:{origin}:{destination}:{departure_date}")
+        if origin == destination or rng.random() < self.no_service_rate:
+            return []
+
+        day = datetime.strptime(departure_date, "%Y-%m-%d")
+        offers = []
+        for index in range(rng.randint(1, self.flights_per_day)):
+            carrier = rng.choice(CARRIERS)
+            departure = day + timedelta(minutes=5 * rng.randrange(288))
+            duration = timedelta(minutes=5 * rng.randint(12, 180))
+            arrival = departure + duration
+            segment = {
+                "departure": {"iataCode": origin, "at": departure.strftime("%Y-%m-%dT%H:%M:%S")},
+                "arrival": {"iataCode": destination, "at": arrival.strftime("%Y-%m-%dT%H:%M:%S")},
+                "carrierCode": carrier,
+                "number": str(rng.randint(1, 9999)),
+                "duration": _iso_duration(duration),
+                "numberOfStops": 1 if rng.random() < self.stops_rate else 0,
+            }
+            segments = [segment]
+            if rng.random() < self.connection_rate:
+                segments.append(dict(segment))
+            offers.append({
+                "type": "flight-offer",
+                "id": str(index + 1),
+                "itineraries": [{"duration": segment["duration"], "segments": segments}],
+                "price": {"currency": currency, "total": f"{rng.uniform(60, 1500):.2f}"},
+                "validatingAirlineCodes": [carrier],
+            })
+        return offers
+
+
+    def search(self, params):
+        """Answer flight-offers query params with a response body, honouring nonStop and max."""
+        offers = self.offers(
+            params.get("originLocationCode"),
+            params.get("destinationLocationCode"),
+            params.get("departureDate"),
+            params.get("currencyCode", "USD"),
+        )
+        if str(params.get("nonStop")).lower() == "true":
+            offers = [
+                offer for offer in offers
+                if len(offer["itineraries"][0]["segments"]) == 1
+                and offer["itineraries"][0]["segments"][0]["numberOfStops"] == 0
+            ]
+        offers = offers[:int(params.get("max", 250))]
+        return {"meta": {"count": len(offers)}, "data": offers}
+
+
+class FakeAmadeusClient:
+    def __init__(self, timetable=None, seed=0):
+        """
+        In-process stand-in for AmadeusClient that answers flight-offers searches
+        from a Timetable without HTTP, for tests and engine-only benchmarks.
+        Install it with `amadeus_client._client = FakeAmadeusClient()`.
+        """
+        self.timetable = timetable or Timetable(seed=seed)
+        self.requests = Counter()
+        self._lock = threading.Lock()
+
+    def search_flight_offers(self, params):
+        with self._lock:
+            self.requests[tuple(sorted(params.items()))] += 1
+        return self.timetable.search(params)
+
+
+def _iso_duration(duration):
+    minutes = int(duration.total_seconds()) // 60
+    return f"PT{minutes // 60}H{minutes % 60}M"
+
+
+class MockAmadeusServer:
+    def __init__(self, host="127.0.0.1", port=0, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0,
+                 rate_limit_rate=0.0, timetable=None, seed=0):
+        """
+        Threaded HTTP server implementing the Amadeus token and flight-offers endpoints.
+        :param latency_ms: Base delay added to every flight-offers response.
+        :param jitter_ms: Extra uniformly distributed delay on top of latency_ms.
+        :param error_rate: Share of flight-offers requests answered with a 500.
+        :param rate_limit_rate: Share of flight-offers requests answered with a 429.
+        """
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.timetable = timetable or Timetable(seed=seed)
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body go out as separate writes; without this every response waits on a delayed ACK.
+            disable_nagle_algorithm = True
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                self.rfile.read(length)
+                if urlparse(self.path).path != "/v1/security/oauth2/token":
+                    return mock._send(self, 404, {"errors": [{"title": "Not found"}]})
+                with mock._lock:
+                    mock.token_requests += 1
+                mock._send(self, 200, {"access_token": "mock-token", "token_type": "Bearer", "expires_in": 1799})
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path != "/v2/shopping/flight-offers":
+                    return mock._send(self, 404, {"errors": [{"title": "Not found"}]})
+                mock._flight_offers(self, {key: values[0] for key, values in parse_qs(url.query).items()})
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def reset_stats(self):
+        with self._lock:
+            self.token_requests = 0
+            self.offer_requests = Counter()
+            self.errors_injected = 0
+            self.response_bytes = 0
+
+    def request_counts(self):
+        """Return a copy of the per-request counters, keyed by sorted query parameters."""
+        with self._lock:
+            return Counter(self.offer_requests)
+
+    def stats(self):
+        with self._lock:
+            total = sum(self.offer_requests.values())
+            return {
+                "token_requests": self.token_requests,
+                "offer_requests": total,
+                "distinct_offer_requests": len(self.offer_requests),
+                "errors_injected": self.errors_injected,
+                "response_bytes": self.response_bytes,
+            }
+
+    def _send(self, handler, status, body):
+        payload = json.dumps(body).encode("utf-8")
+        handler.send_response(status)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(payload)))
+        handler.end_headers()
+        handler.wfile.write(payload)
+        with self._lock:
+            self.response_bytes += len(payload)
+
+    def _flight_offers(self, handler, params):
+        key = tuple(sorted(params.items()))
+        with self._lock:
+            self.offer_requests[key] += 1
+            roll = self._random.random()
+            delay = (self.latency_ms + self._random.uniform(0, self.jitter_ms)) / 1000.0
+        time.sleep(delay)
+
+        if roll < self.rate_limit_rate:
+            with self._lock:
+                self.errors_injected += 1
+            return self._send(handler, 429, {"errors": [{"status": 429, "title": "Too many requests"}]})
+        if roll < self.rate_limit_rate + self.error_rate:
+            with self._lock:
+                self.errors_injected += 1
+            return self._send(handler, 500, {"errors": [{"status": 500, "title": "Internal error"}]})
+
+        self._send(handler, 200, self.timetable.search(params))
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, name="mock-amadeus", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local mock of the Amadeus flight-offers API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8088)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    server = MockAmadeusServer(
+        host=args.host, port=args.port, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate, seed=args.seed,
+    )
+    print(f"Mock Amadeus listening on {server.base_url}")
+    try:
+        server.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server.server_close()
+
+
+if __name__ == "__main__":
+    main()
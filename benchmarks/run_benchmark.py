@@ -0,0 +1,239 @@
+"""
+End-to-end benchmark of /api/flights and the itinerary engines against a local
+mock Amadeus server.
+
+    python benchmarks/run_benchmark.py --searches 10 --latency-ms 100 --output bench.json
+    python benchmarks/run_benchmark.py --compare bench.json
+
+Reports latency percentiles, Amadeus calls per search, the duplicate-call ratio
+and peak traced memory, and writes them as JSON so runs can be compared.
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_amadeus import MockAmadeusServer, Timetable  # noqa: E402
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(fraction * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def summarize_latencies(latencies):
+    return {
+        "count": len(latencies),
+        "mean_ms": statistics.mean(latencies) * 1000,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p90_ms": percentile(latencies, 0.90) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "max_ms": max(latencies) * 1000,
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def search_queries(args):
+    """One query per search, walking forward a day at a time so cold runs differ."""
+    start = datetime.strptime(args.date, "%Y-%m-%d")
+    for index in range(args.searches):
+        day = start + timedelta(days=index % args.distinct_dates)
+        yield {
+            "start_origin": args.origin,
+            "departure_date": day.strftime("%Y-%m-%d"),
+            "departure_time": args.time,
+            "flight_type": args.flight_type,
+        }
+
+
+def run_searches(label, run_one, queries, server, caches, warm):
+    """Time run_one(query) for every query and collect Amadeus call counts."""
+    latencies = []
+    calls = []
+    duplicates = []
+    outcomes = {}
+    server.reset_stats()
+    for query in queries:
+        if not warm:
+            for cache in caches:
+                cache.clear()
+        before = server.request_counts()
+        started = time.perf_counter()
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            outcome = run_one(query)
+        latencies.append(time.perf_counter() - started)
+        made = server.request_counts() - before
+        calls.append(sum(made.values()))
+        duplicates.append(sum(made.values()) - len(made))
+        outcomes[outcome] = outcomes.get(outcome, 0) + 1
+
+    stats = server.stats()
+    total = stats["offer_requests"]
+    return {
+        "name": label,
+        "latency": summarize_latencies(latencies),
+        "api_calls_per_search": statistics.mean(calls),
+        "api_calls_total": total,
+        "distinct_api_calls": stats["distinct_offer_requests"],
+        # Repeats of the same request within one search; retries after injected errors count too.
+        "duplicate_call_ratio": (sum(duplicates) / total) if total else 0.0,
+        # Repeats across the whole run, which a warm or shared cache would avoid.
+        "cross_search_duplicate_ratio": (1 - stats["distinct_offer_requests"] / total) if total else 0.0,
+        "token_requests": stats["token_requests"],
+        "errors_injected": stats["errors_injected"],
+        "response_bytes": stats["response_bytes"],
+        "outcomes": outcomes,
+    }
+
+
+def peak_memory(run_one, query, caches):
+    """Peak traced allocation for a single cold search, measured separately from timing."""
+    for cache in caches:
+        cache.clear()
+    tracemalloc.start()
+    try:
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            run_one(query)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def compare(current, baseline):
+    """Print the change of each headline metric against a previous run."""
+    print(f"\nComparison against {baseline.get('revision')} ({baseline.get('started_at')}):")
+    baseline_scenarios = {scenario["name"]: scenario for scenario in baseline.get("scenarios", [])}
+    for scenario in current["scenarios"]:
+        previous = baseline_scenarios.get(scenario["name"])
+        if previous is None:
+            continue
+        for metric, now, before in (
+            ("p50_ms", scenario["latency"]["p50_ms"], previous["latency"]["p50_ms"]),
+            ("p95_ms", scenario["latency"]["p95_ms"], previous["latency"]["p95_ms"]),
+            ("api_calls_per_search", scenario["api_calls_per_search"], previous["api_calls_per_search"]),
+            ("duplicate_call_ratio", scenario["duplicate_call_ratio"], previous["duplicate_call_ratio"]),
+            ("peak_memory_bytes", scenario["peak_memory_bytes"], previous["peak_memory_bytes"]),
+        ):
+            change = ((now - before) / before * 100) if before else 0.0
+            print(f"  {scenario['name']:<14} {metric:<22} {before:>14.2f} -> {now:>14.2f} ({change:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark flight searches against a mock Amadeus API.")
+    parser.add_argument("--searches", type=int, default=5)
+    parser.add_argument("--origin", default="PUQ")
+    parser.add_argument("--date", default="2025-03-15")
+    parser.add_argument("--time", default="10:00")
+    parser.add_argument("--distinct-dates", type=int, default=3,
+                        help="Number of different departure dates the searches cycle through.")
+    parser.add_argument("--flight-type", default="direct", choices=["direct", "stops", "both"])
+    parser.add_argument("--warm", action="store_true", help="Keep the offer and result caches between searches.")
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--jitter-ms", type=float, default=25.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--flights-per-day", type=int, default=6)
+    parser.add_argument("--no-service-rate", type=float, default=0.15)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the results as JSON to this file.")
+    parser.add_argument("--compare", help="Compare against a previous JSON result file.")
+    args = parser.parse_args()
+
+    timetable = Timetable(seed=args.seed, flights_per_day=args.flights_per_day, no_service_rate=args.no_service_rate)
+    server = MockAmadeusServer(
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate, timetable=timetable, seed=args.seed,
+    ).start()
+
+    # The app reads its settings at import time, so point it at the mock first.
+    os.environ.update({
+        "AMADEUS_API_KEY": "benchmark",
+        "AMADEUS_API_SECRET": "benchmark",
+        "AMADEUS_BASE_URL": server.base_url,
+        "AMADEUS_RECORD_MODE": "off",
+        "AMADEUS_BACKOFF_BASE_SECONDS": os.getenv("AMADEUS_BACKOFF_BASE_SECONDS", "0.05"),
+        # Measure the search itself unless a production rate limit is asked for explicitly.
+        "AMADEUS_REQUESTS_PER_SECOND": os.getenv("AMADEUS_REQUESTS_PER_SECOND", "1000"),
+        "AMADEUS_BURST": os.getenv("AMADEUS_BURST", "1000"),
+        "LOG_LEVEL": os.getenv("LOG_LEVEL", "WARNING"),
+    })
+    import app as flask_app
+    from cache import offer_cache, result_cache
+    from destinations import CONTINENT_LAYERS
+    from flight_engine import FlightEngine
+    from search_engine import find_best_itinerary
+
+    client = flask_app.app.test_client()
+
+    def run_endpoint(query):
+        return client.get("/api/flights", query_string=query).get_json().get("status")
+
+    def engine_runner(mode):
+        def run_engine(query):
+            start_time = flask_app.parse_search_params({**query, "flight_type": mode})[0]["current_time"]
+            result = find_best_itinerary(FlightEngine(mode), query["start_origin"], CONTINENT_LAYERS, start_time)
+            return "SUCCESS" if result else "FAILED"
+        return run_engine
+
+    queries = list(search_queries(args))
+    caches = [offer_cache, result_cache]
+    scenarios = [("api_flights", run_endpoint), ("engine_direct", engine_runner("direct")),
+                 ("engine_stops", engine_runner("stops"))]
+
+    results = {
+        "benchmark": "flight_search",
+        "revision": git_revision(),
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "config": vars(args),
+        "scenarios": [],
+    }
+    try:
+        for name, run_one in scenarios:
+            scenario = run_searches(name, run_one, queries, server, caches, args.warm)
+            scenario["peak_memory_bytes"] = peak_memory(run_one, queries[0], caches)
+            results["scenarios"].append(scenario)
+            latency = scenario["latency"]
+            print(
+                f"{name:<14} p50 {latency['p50_ms']:8.1f} ms  p95 {latency['p95_ms']:8.1f} ms  "
+                f"calls/search {scenario['api_calls_per_search']:6.1f}  "
+                f"duplicates {scenario['duplicate_call_ratio']:.1%}  "
+                f"peak mem {scenario['peak_memory_bytes'] / 1024:8.1f} KiB"
+            )
+    finally:
+        server.stop()
+
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            compare(results, json.load(baseline_file))
+
+
+if __name__ == "__main__":
+    main()
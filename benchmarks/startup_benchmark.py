@@ -0,0 +1,147 @@
+"""
+Cold-start benchmark: how long a fresh process takes to import the app, to
+warm up, and to answer its first and second /api/flights searches against a
+local mock Amadeus server.
+
+    python benchmarks/startup_benchmark.py --trials 5 --output startup.json
+    python benchmarks/startup_benchmark.py --warm-up --compare startup.json
+
+Every trial runs in its own interpreter so nothing is imported or cached yet.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_amadeus import MockAmadeusServer  # noqa: E402
+from run_benchmark import git_revision  # noqa: E402
+
+METRICS = ("process_ms", "import_ms", "warm_up_ms", "first_request_ms", "second_request_ms")
+
+
+def child(args):
+    """Run one trial inside a fresh interpreter and print its timings as JSON."""
+    timings = {}
+    started = time.perf_counter()
+    import app as flask_app
+    timings["import_ms"] = (time.perf_counter() - started) * 1000
+
+    timings["warm_up_ms"] = 0.0
+    if args.warm_up:
+        from engines import warm_up
+        started = time.perf_counter()
+        warm_up()
+        timings["warm_up_ms"] = (time.perf_counter() - started) * 1000
+
+    client = flask_app.app.test_client()
+    for name, date in (("first_request_ms", args.date), ("second_request_ms", args.second_date)):
+        query = {"start_origin": args.origin, "departure_date": date, "departure_time": args.time}
+        started = time.perf_counter()
+        status = client.get("/api/flights", query_string=query).get_json().get("status")
+        timings[name] = (time.perf_counter() - started) * 1000
+        timings[name.replace("_ms", "_status")] = status
+    print(json.dumps(timings))
+
+
+def run_trial(args, server):
+    env = dict(os.environ)
+    env.update({
+        "AMADEUS_API_KEY": "benchmark",
+        "AMADEUS_API_SECRET": "benchmark",
+        "AMADEUS_BASE_URL": server.base_url,
+        "AMADEUS_RECORD_MODE": "off",
+        "AMADEUS_REQUESTS_PER_SECOND": env.get("AMADEUS_REQUESTS_PER_SECOND", "1000"),
+        "AMADEUS_BURST": env.get("AMADEUS_BURST", "1000"),
+        "LOG_LEVEL": env.get("LOG_LEVEL", "WARNING"),
+    })
+    command = [sys.executable, os.path.abspath(__file__), "--child", "--origin", args.origin, "--date", args.date,
+               "--second-date", args.second_date, "--time", args.time]
+    if args.warm_up:
+        command.append("--warm-up")
+    started = time.perf_counter()
+    output = subprocess.check_output(command, cwd=ROOT, env=env)
+    timings = json.loads(output.decode().strip().splitlines()[-1])
+    timings["process_ms"] = (time.perf_counter() - started) * 1000
+    return timings
+
+
+def summarize(trials):
+    return {
+        metric: {
+            "median": statistics.median(trial[metric] for trial in trials),
+            "min": min(trial[metric] for trial in trials),
+            "max": max(trial[metric] for trial in trials),
+        }
+        for metric in METRICS
+    }
+
+
+def compare(current, baseline):
+    print(f"\nComparison against {baseline.get('revision')} ({baseline.get('started_at')}):")
+    for metric in METRICS:
+        now = current["summary"][metric]["median"]
+        before = baseline["summary"].get(metric, {}).get("median")
+        if before is None:
+            continue
+        change = ((now - before) / before * 100) if before else 0.0
+        print(f"  {metric:<18} {before:>10.1f} -> {now:>10.1f} ms ({change:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark process start-up and the first searches.")
+    parser.add_argument("--trials", type=int, default=5)
+    parser.add_argument("--warm-up", action="store_true", help="Run engines.warm_up() before the first request.")
+    parser.add_argument("--origin", default="PUQ")
+    parser.add_argument("--date", default="2025-03-15")
+    parser.add_argument("--second-date", default="2025-03-16")
+    parser.add_argument("--time", default="10:00")
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--jitter-ms", type=float, default=25.0)
+    parser.add_argument("--output", help="Write the results as JSON to this file.")
+    parser.add_argument("--compare", help="Compare against a previous JSON result file.")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args)
+        return
+
+    server = MockAmadeusServer(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms).start()
+    try:
+        trials = [run_trial(args, server) for _ in range(args.trials)]
+    finally:
+        server.stop()
+
+    results = {
+        "benchmark": "startup",
+        "revision": git_revision(),
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "config": vars(args),
+        "trials": trials,
+        "summary": summarize(trials),
+    }
+    for metric, summary in results["summary"].items():
+        print(f"{metric:<18} median {summary['median']:8.1f} ms  min {summary['min']:8.1f} ms  "
+              f"max {summary['max']:8.1f} ms")
+
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            compare(results, json.load(baseline_file))
+
+
+if __name__ == "__main__":
+    main()
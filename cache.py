@@ -0,0 +1,153 @@
+import threading
+import time
+from collections import OrderedDict
+
+from config import (
+    NEGATIVE_CACHE_TTL_SECONDS,
+    OFFER_CACHE_MAX_ENTRIES,
+    OFFER_CACHE_TTL_SECONDS,
+    RESULT_CACHE_MAX_ENTRIES,
+    RESULT_CACHE_TTL_SECONDS,
+)
+
+
+class _InFlight:
+    """A pending load that concurrent callers for the same key wait on."""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class TTLCache:
+    def __init__(self, ttl_seconds, max_entries, ttl_for=None):
+        """
+        Thread-safe cache with per-entry expiry and LRU eviction.
+        :param ttl_seconds: How long an entry stays fresh, in seconds.
+        :param max_entries: Upper bound on stored entries; least recently used go first.
+        :param ttl_for: Optional function of a stored value returning its TTL, overriding ttl_seconds.
+        """
+        self.ttl_seconds = ttl_seconds
+        self.ttl_for = ttl_for
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def _lookup(self, key, now):
+        """Return (True, value) for a fresh entry, evicting it if expired. Caller holds the lock."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        expires_at, value = entry
+        if expires_at <= now:
+            del self._entries[key]
+            return False, None
+        self._entries.move_to_end(key)
+        return True, value
+
+    def _store(self, key, value, now, ttl_seconds=None):
+        """Insert a value and trim the cache down to max_entries. Caller holds the lock."""
+        if ttl_seconds is None:
+            ttl_seconds = self.ttl_for(value) if self.ttl_for else self.ttl_seconds
+        self._entries[key] = (now + ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, key, default=None):
+        """Return the cached value for key without loading it."""
+        with self._lock:
+            found, value = self._lookup(key, time.monotonic())
+            if found:
+                self.hits += 1
+                return value
+            self.misses += 1
+            return default
+
+    def contains(self, key):
+        """Return whether key holds a fresh entry, without counting a hit or miss."""
+        with self._lock:
+            return self._lookup(key, time.monotonic())[0]
+
+    def set(self, key, value):
+        with self._lock:
+            self._store(key, value, time.monotonic())
+
+    def get_or_load(self, key, loader, ttl_seconds=None, timeout=None):
+        """
+        Return the cached value for key, calling loader() on a miss.
+        Concurrent misses for the same key share a single loader() call; if it
+        raises, every waiter sees the exception and nothing is cached.
+        ttl_seconds, if given, is how long a loaded value stays fresh instead of the cache's own TTL.
+        timeout, if given, is how many seconds to wait for another caller's load
+        before raising TimeoutError; the load itself carries on.
+        """
+        with self._lock:
+            found, value = self._lookup(key, time.monotonic())
+            if found:
+                self.hits += 1
+                return value
+            self.misses += 1
+            pending = self._in_flight.get(key)
+            owner = pending is None
+            if owner:
+                pending = _InFlight()
+                self._in_flight[key] = pending
+
+        if not owner:
+            if not pending.event.wait(None if timeout is None else max(0.0, timeout)):
+                raise TimeoutError(f"Gave up waiting for the load of {key!r}")
+            if pending.error is not None:
+                raise pending.error
+            return pending.value
+
+        try:
+            pending.value = loader()
+        except BaseException as error:
+            pending.error = error
+            raise
+        else:
+            with self._lock:
+                self._store(key, pending.value, time.monotonic(), ttl_seconds)
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+            pending.event.set()
+        return pending.value
+
+    def discard(self, key):
+        """Drop the entry for key, if any."""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Return hit/miss counters and the current size."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": (self.hits / lookups) if lookups else 0.0,
+                "size": len(self._entries),
+                "in_flight": len(self._in_flight),
+            }
+
+
+def offer_ttl(leg):
+    """TTL of a cached LegOffers: legs with no usable offers are asked for again sooner."""
+    return OFFER_CACHE_TTL_SECONDS if len(leg) else NEGATIVE_CACHE_TTL_SECONDS
+
+
+# Process-wide cache of decoded Amadeus flight offers, shared by every engine.
+offer_cache = TTLCache(OFFER_CACHE_TTL_SECONDS, OFFER_CACHE_MAX_ENTRIES, ttl_for=offer_ttl)
+
+# Process-wide cache of finished /api/flights responses, keyed on the normalized search.
+result_cache = TTLCache(RESULT_CACHE_TTL_SECONDS, RESULT_CACHE_MAX_ENTRIES)
@@ -0,0 +1,255 @@
+"""
+Warms the offer cache for popular searches during off-peak hours.
+
+    python cache_warmer.py                 # run on schedule until stopped
+    python cache_warmer.py --once --force  # one run now, whatever the hour
+    python cache_warmer.py --log-file app.log
+
+As a separate process it only helps the app's workers when SHARED_CACHE_PATH
+points them all at the same shared offer cache.
+"""
+import argparse
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from datetime import datetime, timedelta
+
+import pytz
+
+from airports import get_timezone
+from config import (
+    CACHE_WARMING_DAILY_BUDGET,
+    CACHE_WARMING_DAYS,
+    CACHE_WARMING_INTERVAL_SECONDS,
+    CACHE_WARMING_LEARN_TOP,
+    CACHE_WARMING_LEARN_WINDOW_HOURS,
+    CACHE_WARMING_OFF_PEAK_HOURS,
+    CACHE_WARMING_ROUTES,
+    CACHE_WARMING_START_TIME,
+    CACHE_WARMING_TTL_SECONDS,
+    SHARED_CACHE_PATH,
+)
+from destinations import CONTINENT_LAYERS
+from engines import get_engine
+from prefetch import prefetch_search
+from rate_limiter import QuotaExceededError, amadeus_scheduler
+
+logger = logging.getLogger(__name__)
+
+# Rate-limiter priority of warming calls, below any user search.
+WARMING_PRIORITY = -100
+# Stops first: its full queries also answer the direct searches warmed after it.
+WARMING_MODES = ("stops", "direct")
+
+
+def parse_routes(spec, default_days=CACHE_WARMING_DAYS):
+    """Parse "PUQ:14,SCL" into [("PUQ", 14), ("SCL", default_days)]."""
+    routes = []
+    for entry in spec.split(","):
+        origin, _, days = entry.strip().partition(":")
+        if origin:
+            routes.append((origin.upper(), int(days) if days else default_days))
+    return routes
+
+
+def parse_hours(spec):
+    """Parse UTC hour ranges such as "22-2,13" into a set of hours; ranges may wrap past midnight."""
+    hours = set()
+    for entry in spec.split(","):
+        first, _, last = entry.strip().partition("-")
+        if not first:
+            continue
+        start, end = int(first), int(last or first)
+        hour = start
+        while True:
+            hours.add(hour % 24)
+            if hour % 24 == end % 24:
+                break
+            hour += 1
+    return hours
+
+
+class SearchPopularity:
+    def __init__(self, max_searches=10000):
+        """
+        Recent searches, for learning which origins are worth warming.
+        :param max_searches: Searches remembered; older ones are forgotten first.
+        """
+        self._searches = deque(maxlen=max_searches)
+        self._lock = threading.Lock()
+
+    def record(self, origin, at=None):
+        with self._lock:
+            self._searches.append((at if at is not None else time.time(), origin))
+
+    def learn_from_log(self, path):
+        """
+        Record the searches found in a JSON-format app log (LOG_FORMAT=json).
+        Returns how many were recorded.
+        """
+        recorded = 0
+        with open(path) as log_file:
+            for line in log_file:
+                try:
+                    entry = json.loads(line)
+                    if not entry.get("start_origin"):
+                        continue
+                    at = datetime.strptime(entry["time"], "%Y-%m-%d %H:%M:%S,%f").timestamp()
+                except (ValueError, KeyError, TypeError, AttributeError):
+                    continue
+                self.record(entry["start_origin"], at)
+                recorded += 1
+        return recorded
+
+    def top(self, n, window_seconds, now=None):
+        """The n most searched origins within the last window_seconds, most searched first."""
+        since = (now if now is not None else time.time()) - window_seconds
+        with self._lock:
+            counts = Counter(origin for at, origin in self._searches if at >= since)
+        return [origin for origin, _ in counts.most_common(n)]
+
+
+# Process-wide record of the searches this process has served.
+search_popularity = SearchPopularity()
+
+
+class CacheWarmer:
+    def __init__(self, routes=None, learn_top=CACHE_WARMING_LEARN_TOP,
+                 learn_window_hours=CACHE_WARMING_LEARN_WINDOW_HOURS, days=CACHE_WARMING_DAYS,
+                 off_peak_hours=CACHE_WARMING_OFF_PEAK_HOURS, daily_budget=CACHE_WARMING_DAILY_BUDGET,
+                 interval_seconds=CACHE_WARMING_INTERVAL_SECONDS, start_time=CACHE_WARMING_START_TIME,
+                 ttl_seconds=CACHE_WARMING_TTL_SECONDS, popularity=search_popularity):
+        """
+        Runs the prefetch pass of a search for every popular (origin, date) so its
+        legs land in the offer cache, nearest dates first.
+        :param routes: (origin, days) pairs to always warm; CACHE_WARMING_ROUTES by default.
+        :param learn_top: Most searched origins to warm as well, for the next `days` days.
+        :param learn_window_hours: How far back searches count towards popularity.
+        :param off_peak_hours: UTC hour ranges run_forever() may warm in.
+        :param daily_budget: Amadeus requests allowed per UTC day, checked between searches.
+        :param interval_seconds: Pause between runs of run_forever().
+        :param start_time: "HH:MM" departure time of the warmed searches.
+        :param ttl_seconds: How long warmed offers stay cached.
+        :param popularity: Where learned searches come from.
+        """
+        self.routes = parse_routes(CACHE_WARMING_ROUTES, days) if routes is None else routes
+        self.learn_top = learn_top
+        self.learn_window_seconds = learn_window_hours * 3600
+        self.days = days
+        self.off_peak_hours = parse_hours(off_peak_hours)
+        self.daily_budget = daily_budget
+        self.interval_seconds = interval_seconds
+        self.start_time = datetime.strptime(start_time, "%H:%M").time()
+        self.ttl_seconds = ttl_seconds
+        self.popularity = popularity
+        self._day = None
+        self._used_today = 0
+        self._thread = None
+
+    def is_off_peak(self, now=None):
+        now = now or datetime.now(pytz.utc)
+        return now.hour in self.off_peak_hours
+
+    def targets(self, now):
+        """
+        The (origin, start_time) searches to warm, in the origin's local time, nearest
+        departure first; departures before now are left out.
+        """
+        days_by_origin = dict(self.routes)
+        if self.learn_top:
+            for origin in self.popularity.top(self.learn_top, self.learn_window_seconds):
+                days_by_origin.setdefault(origin, self.days)
+        targets = []
+        for origin, days in days_by_origin.items():
+            tz = get_timezone(origin)
+            today = now.astimezone(tz).date()
+            for offset in range(days):
+                start_time = tz.localize(datetime.combine(today + timedelta(days=offset), self.start_time))
+                if start_time > now:
+                    targets.append((origin, start_time))
+        return sorted(targets, key=lambda target: (target[1], target[0]))
+
+    def run_once(self, now=None):
+        """
+        Warm every target until the daily budget is used up.
+        Returns a summary of the searches warmed and Amadeus requests made.
+        """
+        now = now or datetime.now(pytz.utc)
+        if now.date() != self._day:
+            self._day = now.date()
+            self._used_today = 0
+
+        run_id = f"cache-warmer-{uuid.uuid4().hex}"
+        started = time.perf_counter()
+        warmed = 0
+        targets = self.targets(now)
+        with amadeus_scheduler.bind(search_id=run_id, priority=WARMING_PRIORITY):
+            for origin, start_time in targets:
+                if self.daily_budget and self._used_today >= self.daily_budget:
+                    break
+                try:
+                    for mode in WARMING_MODES:
+                        prefetch_search(get_engine(mode, self.ttl_seconds), origin, CONTINENT_LAYERS, start_time,
+                                        base_priority=WARMING_PRIORITY)
+                except QuotaExceededError as error:
+                    logger.warning("Cache warming stopped: %s", error)
+                    break
+                except Exception as error:
+                    logger.warning("Error warming %s from %s: %s", origin, start_time, error)
+                finally:
+                    self._used_today += amadeus_scheduler.pop_search_calls(run_id)
+                warmed += 1
+
+        summary = {"searches_warmed": warmed, "searches_planned": len(targets),
+                   "amadeus_calls_today": self._used_today,
+                   "duration_ms": round((time.perf_counter() - started) * 1000)}
+        logger.info("Cache warming finished", extra=summary)
+        return summary
+
+    def run_forever(self):
+        while True:
+            if self.is_off_peak():
+                try:
+                    self.run_once()
+                except Exception:
+                    logger.exception("Cache warming run failed")
+            time.sleep(self.interval_seconds)
+
+    def start(self):
+        """Run run_forever() on a daemon thread, once per process."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.run_forever, name="cache-warmer", daemon=True)
+            self._thread.start()
+        return self._thread
+
+
+def main():
+    from logging_config import configure_logging
+
+    parser = argparse.ArgumentParser(description="Warm the offer cache for popular searches.")
+    parser.add_argument("--once", action="store_true", help="Run once and exit instead of on schedule.")
+    parser.add_argument("--force", action="store_true", help="With --once, run even outside off-peak hours.")
+    parser.add_argument("--log-file", help="JSON-format app log to learn popular origins from.")
+    args = parser.parse_args()
+    configure_logging()
+
+    if not SHARED_CACHE_PATH:
+        logger.warning("SHARED_CACHE_PATH is not set, so warmed offers stay in this process only")
+    if args.log_file:
+        logger.info("Learned searches from %s", args.log_file,
+                    extra={"searches": search_popularity.learn_from_log(args.log_file)})
+
+    warmer = CacheWarmer()
+    if not args.once:
+        warmer.run_forever()
+    elif args.force or warmer.is_off_peak():
+        warmer.run_once()
+    else:
+        logger.info("Outside off-peak hours, nothing warmed")
+
+
+if __name__ == "__main__":
+    main()
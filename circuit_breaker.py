@@ -0,0 +1,113 @@
+import logging
+import threading
+import time
+
+from config import CIRCUIT_BREAKER_FAILURE_THRESHOLD, CIRCUIT_BREAKER_HALF_OPEN_PROBES, CIRCUIT_BREAKER_OPEN_SECONDS
+from metrics import CIRCUIT_REJECTIONS, CIRCUIT_STATE
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+# Values of the circuit_breaker_state gauge.
+STATE_VALUES = {CLOSED: 0, OPEN: 1, HALF_OPEN: 2}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of making a call while the circuit is open."""
+
+
+class CircuitBreaker:
+    def __init__(self, name, failure_threshold=CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+                 open_seconds=CIRCUIT_BREAKER_OPEN_SECONDS, half_open_probes=CIRCUIT_BREAKER_HALF_OPEN_PROBES):
+        """
+        Fails calls to a flapping endpoint fast instead of letting them queue up.
+        Each call is bracketed by before_call() and one of record_success(),
+        record_failure() or release().
+        :param name: Endpoint the breaker guards, used in metrics and logs.
+        :param failure_threshold: Failures in a row that open the circuit.
+        :param open_seconds: How long the circuit stays open before probing.
+        :param half_open_probes: Calls let through at once while half-open; the first
+            success closes the circuit again and any failure re-opens it.
+        """
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.open_seconds = open_seconds
+        self.half_open_probes = max(1, half_open_probes)
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+        self._lock = threading.Lock()
+        CIRCUIT_STATE.set(STATE_VALUES[CLOSED], endpoint=name)
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+                return HALF_OPEN
+            return self._state
+
+    def _set_state(self, state):
+        """Caller holds the lock."""
+        if state != self._state:
+            logger.log(logging.WARNING if state == OPEN else logging.INFO, "Circuit %s is %s", self.name, state,
+                       extra={"failures": self._failures})
+        self._state = state
+        CIRCUIT_STATE.set(STATE_VALUES[state], endpoint=self.name)
+
+    def before_call(self):
+        """Let a call through, or raise CircuitOpenError while open or out of half-open probes."""
+        with self._lock:
+            if self._state == OPEN:
+                retry_in = self.open_seconds - (time.monotonic() - self._opened_at)
+                if retry_in > 0:
+                    CIRCUIT_REJECTIONS.inc(endpoint=self.name)
+                    raise CircuitOpenError(f"Circuit {self.name} is open, retrying in {retry_in:.1f}s")
+                self._set_state(HALF_OPEN)
+            if self._state == HALF_OPEN:
+                if self._probes >= self.half_open_probes:
+                    CIRCUIT_REJECTIONS.inc(endpoint=self.name)
+                    raise CircuitOpenError(f"Circuit {self.name} is half-open and already probing")
+                self._probes += 1
+
+    def _end_probe(self):
+        """Caller holds the lock."""
+        if self._state == HALF_OPEN:
+            self._probes = max(0, self._probes - 1)
+
+    def record_success(self):
+        with self._lock:
+            self._end_probe()
+            self._failures = 0
+            if self._state != CLOSED:
+                self._probes = 0
+                self._set_state(CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self._end_probe()
+            self._failures += 1
+            if self._state == HALF_OPEN or (self._state == CLOSED and self._failures >= self.failure_threshold):
+                self._probes = 0
+                self._opened_at = time.monotonic()
+                self._set_state(OPEN)
+
+    def release(self):
+        """End a call that never reached the endpoint, so it counts neither way."""
+        with self._lock:
+            self._end_probe()
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(name):
+    """Return the process-wide breaker for an endpoint, creating it on first use."""
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = _breakers[name] = CircuitBreaker(name)
+        return breaker
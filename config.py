@@ -1,8 +1,150 @@
 import os
 from dotenv import load_dotenv
 
+# The one place .env is read; everything else takes its settings from here.
 load_dotenv()
 
 AMADEUS_API_KEY = os.getenv("AMADEUS_API_KEY")
 AMADEUS_API_SECRET = os.getenv("AMADEUS_API_SECRET")
-AMADEUS_BASE_URL = os.getenv("AMADEUS_BASE_URL", "https://test.api.amadeus.com")
\ No newline at end of file
+AMADEUS_BASE_URL = os.getenv("AMADEUS_BASE_URL", "https://test.api.amadeus.com")
+
+# SMTP account itinerary emails are sent from.
+SMTP_SERVER = os.getenv("SMTP_SERVER")
+SMTP_PORT = os.getenv("SMTP_PORT")
+EMAIL_ADDRESS = os.getenv("EMAIL_ADDRESS")
+EMAIL_PASSWORD = os.getenv("EMAIL_PASSWORD")
+
+# Flight-offer cache shared by DirectFlight/WithStops lookups.
+OFFER_CACHE_TTL_SECONDS = int(os.getenv("OFFER_CACHE_TTL_SECONDS", "900"))
+OFFER_CACHE_MAX_ENTRIES = int(os.getenv("OFFER_CACHE_MAX_ENTRIES", "5000"))
+# Legs with no offers, such as routes without service that day, are kept for this shorter time instead.
+NEGATIVE_CACHE_TTL_SECONDS = int(os.getenv("NEGATIVE_CACHE_TTL_SECONDS", "300"))
+
+# Second cache tier under the offer cache, shared by every worker on the host through
+# a SQLite file in WAL mode; empty to keep each worker's cache to itself.
+SHARED_CACHE_PATH = os.getenv("SHARED_CACHE_PATH", "")
+SHARED_CACHE_MAX_ENTRIES = int(os.getenv("SHARED_CACHE_MAX_ENTRIES", "50000"))
+# How long the right to fill a key outlives its holder's last renewal; holders renew it every third of
+# this while their load runs, so it only has to cover a crashed worker, not a slow load.
+SHARED_CACHE_LEASE_SECONDS = float(os.getenv("SHARED_CACHE_LEASE_SECONDS", "30"))
+SHARED_CACHE_COMPACT_INTERVAL_SECONDS = float(os.getenv("SHARED_CACHE_COMPACT_INTERVAL_SECONDS", "60"))
+
+# "layered" (earliest-arrival dynamic program) or "exhaustive" (every sequence).
+SEARCH_STRATEGY = os.getenv("SEARCH_STRATEGY", "layered")
+
+# Maximum number of Amadeus leg fetches a search runs in parallel.
+PREFETCH_CONCURRENCY = int(os.getenv("PREFETCH_CONCURRENCY", "8"))
+
+# Background search jobs behind /api/searches.
+SEARCH_JOB_WORKERS = int(os.getenv("SEARCH_JOB_WORKERS", "2"))
+SEARCH_JOB_QUEUE_DEPTH = int(os.getenv("SEARCH_JOB_QUEUE_DEPTH", "16"))
+SEARCH_JOB_RETENTION_SECONDS = int(os.getenv("SEARCH_JOB_RETENTION_SECONDS", "3600"))
+
+# How many sequences a streamed /api/flights response evaluates between progress events.
+STREAM_PROGRESS_EVERY = int(os.getenv("STREAM_PROGRESS_EVERY", "10"))
+
+# Shared Amadeus HTTP client: connection pool, timeouts, retries and token refresh.
+AMADEUS_POOL_SIZE = int(os.getenv("AMADEUS_POOL_SIZE", "16"))
+AMADEUS_TIMEOUT_SECONDS = float(os.getenv("AMADEUS_TIMEOUT_SECONDS", "30"))
+AMADEUS_MAX_RETRIES = int(os.getenv("AMADEUS_MAX_RETRIES", "3"))
+AMADEUS_BACKOFF_BASE_SECONDS = float(os.getenv("AMADEUS_BACKOFF_BASE_SECONDS", "0.5"))
+AMADEUS_BACKOFF_MAX_SECONDS = float(os.getenv("AMADEUS_BACKOFF_MAX_SECONDS", "8"))
+AMADEUS_TOKEN_REFRESH_MARGIN_SECONDS = float(os.getenv("AMADEUS_TOKEN_REFRESH_MARGIN_SECONDS", "60"))
+
+# Record/replay of raw flight-offer responses: "off", "record" or "replay".
+AMADEUS_RECORD_MODE = os.getenv("AMADEUS_RECORD_MODE", "off")
+AMADEUS_RECORD_PATH = os.getenv("AMADEUS_RECORD_PATH", "amadeus_responses.sqlite3")
+
+# Flight-offers query planning. With it enabled, direct searches ask Amadeus for non-stop offers only, at most
+# AMADEUS_NONSTOP_MAX_RESULTS of them; a possibly truncated answer falls back to the full query of
+# AMADEUS_MAX_RESULTS offers, which every mode can use. Searches running both modes fetch the full query first.
+QUERY_PLANNING_ENABLED = os.getenv("QUERY_PLANNING_ENABLED", "true").lower() in ("1", "true", "yes")
+AMADEUS_MAX_RESULTS = int(os.getenv("AMADEUS_MAX_RESULTS", "100"))
+AMADEUS_NONSTOP_MAX_RESULTS = int(os.getenv("AMADEUS_NONSTOP_MAX_RESULTS", "25"))
+
+# Per-endpoint circuit breaker around Amadeus GETs: after CIRCUIT_BREAKER_FAILURE_THRESHOLD transient failures
+# in a row, requests fail fast for CIRCUIT_BREAKER_OPEN_SECONDS, then up to CIRCUIT_BREAKER_HALF_OPEN_PROBES
+# requests at a time are let through to find out whether the endpoint has recovered.
+CIRCUIT_BREAKER_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_BREAKER_FAILURE_THRESHOLD", "5"))
+CIRCUIT_BREAKER_OPEN_SECONDS = float(os.getenv("CIRCUIT_BREAKER_OPEN_SECONDS", "30"))
+CIRCUIT_BREAKER_HALF_OPEN_PROBES = int(os.getenv("CIRCUIT_BREAKER_HALF_OPEN_PROBES", "1"))
+
+# Token-bucket scheduler in front of every Amadeus request; a budget of 0 means unlimited.
+AMADEUS_REQUESTS_PER_SECOND = float(os.getenv("AMADEUS_REQUESTS_PER_SECOND", "10"))
+AMADEUS_BURST = int(os.getenv("AMADEUS_BURST", "10"))
+AMADEUS_DAILY_BUDGET = int(os.getenv("AMADEUS_DAILY_BUDGET", "0"))
+AMADEUS_MAX_QUEUE_WAIT_SECONDS = float(os.getenv("AMADEUS_MAX_QUEUE_WAIT_SECONDS", "60"))
+# SQLite file holding the bucket and the day's request count for every process on the host, so the rate
+# and budget above hold for all gunicorn workers and the cache warmer together and the count survives
+# restarts. Empty keeps them per process, which multiplies the real limits by the number of processes.
+AMADEUS_QUOTA_PATH = os.getenv(
+    "AMADEUS_QUOTA_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "amadeus_quota.sqlite3")
+)
+
+# Number of consecutive days each leg search covers, starting on the earliest departure date.
+DEPARTURE_WINDOW_DAYS = int(os.getenv("DEPARTURE_WINDOW_DAYS", "2"))
+
+# Ranking: weights of the "weighted" objective (per hour of travel, per unit of cost) and the largest top_k served.
+RANKING_TIME_WEIGHT = float(os.getenv("RANKING_TIME_WEIGHT", "50"))
+RANKING_COST_WEIGHT = float(os.getenv("RANKING_COST_WEIGHT", "1"))
+RANKING_MAX_TOP_K = int(os.getenv("RANKING_MAX_TOP_K", "20"))
+
+# Whole-response cache in front of /api/flights. A bucket of N minutes rounds departure_time up to the
+# next multiple of N so nearby searches share one result; 0 keeps the exact time.
+RESULT_CACHE_TTL_SECONDS = int(os.getenv("RESULT_CACHE_TTL_SECONDS", "300"))
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "500"))
+RESULT_CACHE_TIME_BUCKET_MINUTES = int(os.getenv("RESULT_CACHE_TIME_BUCKET_MINUTES", "0"))
+
+# Log level for the application's loggers and the log line format: "text" or "json".
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+
+# Background email delivery: queue size, batching of emails queued close together, retries and SMTP idle time.
+EMAIL_QUEUE_MAX_SIZE = int(os.getenv("EMAIL_QUEUE_MAX_SIZE", "1000"))
+EMAIL_BATCH_SIZE = int(os.getenv("EMAIL_BATCH_SIZE", "20"))
+EMAIL_BATCH_WAIT_SECONDS = float(os.getenv("EMAIL_BATCH_WAIT_SECONDS", "0.5"))
+EMAIL_MAX_RETRIES = int(os.getenv("EMAIL_MAX_RETRIES", "3"))
+EMAIL_BACKOFF_BASE_SECONDS = float(os.getenv("EMAIL_BACKOFF_BASE_SECONDS", "2"))
+EMAIL_SMTP_IDLE_SECONDS = float(os.getenv("EMAIL_SMTP_IDLE_SECONDS", "60"))
+
+# Set to true to warm up engines, the prefetch pool and the Amadeus token in each gunicorn worker after fork.
+WARM_UP_ON_FORK = os.getenv("WARM_UP_ON_FORK", "false").lower() in ("1", "true", "yes")
+
+# Cache warming: prefetch the legs of popular searches during off-peak hours so peak
+# searches find them cached. Warmed offers stay cached for CACHE_WARMING_TTL_SECONDS,
+# which has to carry them from the off-peak window through the following peak.
+# CACHE_WARMING_IN_PROCESS runs the warmer inside each gunicorn worker; with several
+# workers run `python cache_warmer.py` once per host instead, with SHARED_CACHE_PATH set
+# so the workers can read what it fetched.
+CACHE_WARMING_IN_PROCESS = os.getenv("CACHE_WARMING_IN_PROCESS", "false").lower() in ("1", "true", "yes")
+# Comma-separated ORIGIN or ORIGIN:DAYS entries, e.g. "PUQ:14,SCL"; DAYS defaults to CACHE_WARMING_DAYS.
+CACHE_WARMING_ROUTES = os.getenv("CACHE_WARMING_ROUTES", "")
+CACHE_WARMING_DAYS = int(os.getenv("CACHE_WARMING_DAYS", "3"))
+# Also warm the N most searched origins of the last CACHE_WARMING_LEARN_WINDOW_HOURS; 0 disables learning.
+CACHE_WARMING_LEARN_TOP = int(os.getenv("CACHE_WARMING_LEARN_TOP", "5"))
+CACHE_WARMING_LEARN_WINDOW_HOURS = float(os.getenv("CACHE_WARMING_LEARN_WINDOW_HOURS", "24"))
+# UTC hours the warmer may run in, as ranges such as "1-6" or "22-2,13"; ends are inclusive.
+CACHE_WARMING_OFF_PEAK_HOURS = os.getenv("CACHE_WARMING_OFF_PEAK_HOURS", "1-6")
+# Amadeus requests the warmer may make per UTC day, checked between searches. Each warmed origin and day
+# costs roughly 150-300 requests, so this should be about 250 x origins x CACHE_WARMING_DAYS; the default
+# covers the learned top 5 origins for 3 days, nearest days first when it runs short.
+CACHE_WARMING_DAILY_BUDGET = int(os.getenv("CACHE_WARMING_DAILY_BUDGET", "4000"))
+# How long warmed offers stay cached: long enough for ones warmed in the default 1-6 UTC window to last
+# through the day. Legs without offers keep it too, so warming never has to ask for them again that day.
+CACHE_WARMING_TTL_SECONDS = int(os.getenv("CACHE_WARMING_TTL_SECONDS", "64800"))
+CACHE_WARMING_INTERVAL_SECONDS = float(os.getenv("CACHE_WARMING_INTERVAL_SECONDS", "600"))
+# Departure time of the warmed searches, local to their origin; ones already in the past are skipped.
+CACHE_WARMING_START_TIME = os.getenv("CACHE_WARMING_START_TIME", "00:00")
+
+# Bundled airport data (timezones, coordinates, keyword search) and the index compiled from it.
+_DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+AIRPORT_SOURCE_PATH = os.getenv("AIRPORT_SOURCE_PATH", os.path.join(_DATA_DIR, "airports.csv"))
+AIRPORT_INDEX_PATH = os.getenv("AIRPORT_INDEX_PATH", os.path.join(_DATA_DIR, "airport_index.json"))
+
+# Most searches one POST /api/flights/batch request may hold.
+BATCH_MAX_QUERIES = int(os.getenv("BATCH_MAX_QUERIES", "50"))
+
+# Time budget of a search when the request sends no deadline_ms; 0 lets searches run to completion.
+SEARCH_DEADLINE_MS = int(os.getenv("SEARCH_DEADLINE_MS", "25000"))
+# Part of the budget kept for finishing the response; no leg fetch starts inside it.
+SEARCH_DEADLINE_RESERVE_MS = int(os.getenv("SEARCH_DEADLINE_RESERVE_MS", "250"))
@@ -0,0 +1,33 @@
+from datetime import timedelta
+
+# Hardcoded destinations categorized by continent
+south_america_destinations = ["SCL"]
+north_america_destinations = ["MIA", "PTY", "LAX", "SFO", "SAN", "TIJ"]
+europe_destinations = ["MAD", "LIS", "BCN", "ORY", "CMN"]
+africa_destinations = ["CMN", "CAI"]
+asia_destinations = ["DOH", "DXB", "KUL"]
+australia_destinations = ["PER"]
+
+# Continents in the order an itinerary visits them; one airport is picked from each layer.
+CONTINENT_LAYERS = [
+    south_america_destinations,
+    north_america_destinations,
+    europe_destinations,
+    africa_destinations,
+    asia_destinations,
+    australia_destinations,
+]
+
+# Editable buffer times for each IATA code (in hours)
+buffer_hours = {
+    "SAN": 2, "TIJ": 2, "BCN": 2, "ORY": 2, "KUL": 2,
+    "SCL": 0.5, "PUQ": 1.5, "PTY": 2, "LIS": 2, "SFO": 2,
+    "MIA": 2, "JFK": 2, "LAX": 2, "YYZ": 2.8, "DFW": 1.7,
+    "MAD": 2, "LHR": 2.1, "CDG": 1.8, "FRA": 2.5, "AMS": 2.0,
+    "CMN": 2, "JNB": 2.7, "LOS": 1.9, "CAI": 2, "ADD": 1.5,
+    "DOH": 1.5, "DXB": 2, "DEL": 1.6, "SIN": 2.3, "HND": 2.0,
+    "PER": 2, "SYD": 2.8, "MEL": 1.9, "BNE": 2.5, "ADL": 1.7
+}
+
+# Extra travel time added to each itinerary total travel time, editable.
+EXTRA_TRAVEL_TIME = timedelta(hours=2.5)
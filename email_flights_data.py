@@ -1,81 +1,125 @@
-import os
 import json
+import time
+import logging
 import smtplib
+from string import Template
 from datetime import datetime
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from dotenv import load_dotenv
+from config import EMAIL_ADDRESS, EMAIL_PASSWORD, SMTP_PORT, SMTP_SERVER
+from metrics import EMAIL_SEND_SECONDS
 
-load_dotenv()
+logger = logging.getLogger(__name__)
+
+# Parsed once at import; rendering only substitutes values.
+FLIGHT_TEMPLATE = Template("""
+        <li>
+            <strong>$airline $flight_number</strong><br>
+            <strong>Departure:</strong> $departure_time ($origin)<br>
+            <strong>Arrival:</strong> $arrival_time ($destination)<br>
+            <strong>Duration:</strong> $duration<br>
+            <strong>Cost:</strong> $$$cost<br>
+            <strong>Layover:</strong> $layover at $layover_iata<br>
+        </li>
+        """)
+
+EMAIL_TEMPLATE = Template("""
+        <h1>Flight Itinerary</h1>
+        <h2>Flight Sequence</h2>
+        <p>$flight_sequence</p>
+
+        <h2>Flight Details</h2>
+        <ul>$flight_details</ul>
+
+        <h2>Summary</h2>
+        
+        <ul>
+            <li><strong>Total Flight Duration:</strong> $total_flight_duration</li>
+            <li><strong>Total Layover Duration:</strong> $total_layover_duration</li>
+            <li><strong>Total Travel Time:</strong> $total_travel_time</li>
+            <li><strong>Total Cost:</strong> $$$total_cost</li>
+        </ul>
+        
+        """)
 
 class EmailFlightData:
-  def send_mail(self, recipient_email, subject, content):
+  def connect(self):
     """
-    Send an email to the recipient_email with the given subject and content.
+    Open an SMTP connection to SMTP_SERVER and log in with STARTTLS.
+    The caller owns the returned connection and must quit() it.
     """
-    smtp_server = os.getenv("SMTP_SERVER")
-    smtp_port = os.getenv("SMTP_PORT")
-    email_address = os.getenv("EMAIL_ADDRESS")
-    email_password = os.getenv("EMAIL_PASSWORD")
+    server = smtplib.SMTP(SMTP_SERVER, SMTP_PORT)
+    try:
+      server.starttls()
+      server.login(EMAIL_ADDRESS, EMAIL_PASSWORD)
+    except Exception:
+      server.close()
+      raise
+    return server
 
+  def build_message(self, recipient_email, subject, content):
+    """Build the HTML message sent from EMAIL_ADDRESS."""
     message = MIMEMultipart()
-    message["From"] = email_address
+    message["From"] = EMAIL_ADDRESS
     message["To"] = recipient_email
     message["Subject"] = subject
     message.attach(MIMEText(content, "html"))
+    return message
 
+  def send_mail(self, recipient_email, subject, content):
+    """
+    Send an email to the recipient_email with the given subject and content.
+    """
+    message = self.build_message(recipient_email, subject, content)
+
+    started = time.perf_counter()
     try:
-      with smtplib.SMTP(smtp_server, smtp_port) as server:
-        server.starttls()
-        server.login(email_address, email_password)
-        server.sendmail(email_address, recipient_email, message.as_string())
-        print("Email sent successfully.")
+      server = self.connect()
+      with server:
+        server.sendmail(message["From"], recipient_email, message.as_string())
+        EMAIL_SEND_SECONDS.observe(time.perf_counter() - started, outcome="sent")
+        logger.info("Email sent successfully.", extra={"recipient": recipient_email})
 
         return True
     except Exception as e:
-      print(f"Error sending email: {e}")
+      EMAIL_SEND_SECONDS.observe(time.perf_counter() - started, outcome="failed")
+      logger.error("Error sending email: %s", e, extra={"recipient": recipient_email})
       return False
-    
-  def format_email_content(self, best_sequence, best_itinerary):
-      """Format the flight itinerary data into an HTML email."""
+
+  def render_itinerary(self, best_sequence, best_itinerary):
+      """Render an itinerary dict with datetime and timedelta values into an HTML email."""
       flight_sequence = " → ".join(best_sequence)
-      print(flight_sequence)
-      best_itinerary = json.loads(best_itinerary)
-      
-      flight_details = []
-      for flight in best_itinerary["flights"]:
-        departure_time = datetime.strptime(flight["departure_time"], "%Y-%m-%dT%H:%M:%S%z")
-        arrival_time = datetime.strptime(flight["arrival_time"], "%Y-%m-%dT%H:%M:%S%z")
+      logger.debug("Formatting email for sequence %s", flight_sequence)
 
-        flight_details.append(f"""
-        <li>
-            <strong>{flight['airline']} {flight['flight_number']}</strong><br>
-            <strong>Departure:</strong> {departure_time.strftime('%Y-%m-%d %H:%M:%S')} ({flight['origin']})<br>
-            <strong>Arrival:</strong> {arrival_time.strftime('%Y-%m-%d %H:%M:%S')} ({flight['destination']})<br>
-            <strong>Duration:</strong> {flight['duration']}<br>
-            <strong>Cost:</strong> ${flight['cost']:.2f}<br>
-            <strong>Layover:</strong> {flight['layover']} at {flight['layover_iata']}<br>
-        </li>
-        """)
+      flight_details = "".join(
+        FLIGHT_TEMPLATE.substitute(
+          airline=flight['airline'],
+          flight_number=flight['flight_number'],
+          departure_time=flight['departure_time'].strftime('%Y-%m-%d %H:%M:%S'),
+          origin=flight['origin'],
+          arrival_time=flight['arrival_time'].strftime('%Y-%m-%d %H:%M:%S'),
+          destination=flight['destination'],
+          duration=flight['duration'],
+          cost=f"{flight['cost']:.2f}",
+          layover=flight['layover'],
+          layover_iata=flight['layover_iata'],
+        )
+        for flight in best_itinerary["flights"]
+      )
 
-      summary = f"""
-        <ul>
-            <li><strong>Total Flight Duration:</strong> {str(best_itinerary['total_flight_duration'])}</li>
-            <li><strong>Total Layover Duration:</strong> {str(best_itinerary['total_layover_duration'])}</li>
-            <li><strong>Total Travel Time:</strong> {str(best_itinerary['total_travel_time'])}</li>
-            <li><strong>Total Cost:</strong> ${best_itinerary['total_cost']:.2f}</li>
-        </ul>
-        """
-      
-      content = f"""
-        <h1>Flight Itinerary</h1>
-        <h2>Flight Sequence</h2>
-        <p>{flight_sequence}</p>
-
-        <h2>Flight Details</h2>
-        <ul>{''.join(flight_details)}</ul>
+      return EMAIL_TEMPLATE.substitute(
+        flight_sequence=flight_sequence,
+        flight_details=flight_details,
+        total_flight_duration=best_itinerary['total_flight_duration'],
+        total_layover_duration=best_itinerary['total_layover_duration'],
+        total_travel_time=best_itinerary['total_travel_time'],
+        total_cost=f"{best_itinerary['total_cost']:.2f}",
+      )
 
-        <h2>Summary</h2>
-        {summary}
-        """
-      return content
\ No newline at end of file
+  def format_email_content(self, best_sequence, best_itinerary):
+      """Format a JSON-encoded flight itinerary into an HTML email."""
+      best_itinerary = json.loads(best_itinerary)
+      for flight in best_itinerary["flights"]:
+        flight["departure_time"] = datetime.strptime(flight["departure_time"], "%Y-%m-%dT%H:%M:%S%z")
+        flight["arrival_time"] = datetime.strptime(flight["arrival_time"], "%Y-%m-%dT%H:%M:%S%z")
+      return self.render_itinerary(best_sequence, best_itinerary)
@@ -0,0 +1,159 @@
+import atexit
+import logging
+import queue
+import random
+import smtplib
+import threading
+import time
+
+from config import (
+    EMAIL_BACKOFF_BASE_SECONDS,
+    EMAIL_BATCH_SIZE,
+    EMAIL_BATCH_WAIT_SECONDS,
+    EMAIL_MAX_RETRIES,
+    EMAIL_QUEUE_MAX_SIZE,
+    EMAIL_SMTP_IDLE_SECONDS,
+)
+from email_flights_data import EmailFlightData
+from metrics import EMAIL_QUEUE_DEPTH, EMAIL_SEND_SECONDS, registry
+
+logger = logging.getLogger(__name__)
+
+
+def is_transient(error):
+    """Whether an SMTP failure is worth retrying: dropped connections, network errors and 4xx replies."""
+    if isinstance(error, smtplib.SMTPServerDisconnected):
+        return True
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    if isinstance(error, smtplib.SMTPException):
+        return False
+    return isinstance(error, OSError)
+
+
+class _Email:
+    __slots__ = ("recipient", "subject", "content", "attempts")
+
+    def __init__(self, recipient, subject, content):
+        self.recipient = recipient
+        self.subject = subject
+        self.content = content
+        self.attempts = 0
+
+
+class EmailDeliveryQueue:
+    def __init__(self, mailer=None, max_size=EMAIL_QUEUE_MAX_SIZE, batch_size=EMAIL_BATCH_SIZE,
+                 batch_wait_seconds=EMAIL_BATCH_WAIT_SECONDS, max_retries=EMAIL_MAX_RETRIES,
+                 backoff_base_seconds=EMAIL_BACKOFF_BASE_SECONDS, idle_seconds=EMAIL_SMTP_IDLE_SECONDS):
+        """
+        Sends emails from one background thread over a reused, logged-in SMTP connection.
+        :param mailer: Object with connect() and build_message(), an EmailFlightData by default.
+        :param max_size: Emails that may wait before enqueue() starts refusing them.
+        :param batch_size: Most emails sent back to back before the queue is checked again.
+        :param batch_wait_seconds: How long to wait for more emails to join a batch.
+        :param max_retries: Retries of a transient failure before an email is dropped.
+        :param backoff_base_seconds: Base of the exponential backoff between retries.
+        :param idle_seconds: How long an unused connection stays open.
+        """
+        self.mailer = mailer or EmailFlightData()
+        self.batch_size = max(1, batch_size)
+        self.batch_wait_seconds = batch_wait_seconds
+        self.max_retries = max_retries
+        self.backoff_base_seconds = backoff_base_seconds
+        self.idle_seconds = idle_seconds
+        self._queue = queue.Queue(maxsize=max_size)
+        self._connection = None
+        self._worker = None
+        self._lock = threading.Lock()
+
+    def enqueue(self, recipient, subject, content):
+        """Queue an email and return at once; returns False if the queue is full."""
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait(_Email(recipient, subject, content))
+        except queue.Full:
+            logger.error("Email queue is full, dropping email", extra={"recipient": recipient})
+            return False
+        return True
+
+    def depth(self):
+        return self._queue.qsize()
+
+    def drain(self, timeout):
+        """Wait up to timeout seconds for every queued email to be sent or given up on."""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.05)
+        return not self._queue.unfinished_tasks
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._work, name="email-delivery", daemon=True)
+                self._worker.start()
+
+    def _next_batch(self):
+        """Block for the next email, then collect the ones queued close behind it."""
+        try:
+            batch = [self._queue.get(timeout=self.idle_seconds if self._connection else None)]
+        except queue.Empty:
+            self._disconnect()
+            return []
+        deadline = time.monotonic() + self.batch_wait_seconds
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _work(self):
+        while True:
+            for email in self._next_batch():
+                try:
+                    self._deliver(email)
+                except Exception:
+                    logger.exception("Unexpected error delivering email", extra={"recipient": email.recipient})
+                finally:
+                    self._queue.task_done()
+
+    def _deliver(self, email):
+        message = self.mailer.build_message(email.recipient, email.subject, email.content)
+        while True:
+            started = time.perf_counter()
+            try:
+                if self._connection is None:
+                    self._connection = self.mailer.connect()
+                self._connection.sendmail(message["From"], email.recipient, message.as_string())
+            except Exception as error:
+                EMAIL_SEND_SECONDS.observe(time.perf_counter() - started, outcome="failed")
+                self._disconnect()
+                email.attempts += 1
+                if not is_transient(error) or email.attempts > self.max_retries:
+                    logger.error("Error sending email: %s", error,
+                                 extra={"recipient": email.recipient, "attempts": email.attempts})
+                    return
+                delay = random.uniform(0, self.backoff_base_seconds * (2 ** email.attempts))
+                logger.warning("Retrying email in %.1fs after: %s", delay, error, extra={"recipient": email.recipient})
+                time.sleep(delay)
+                continue
+            EMAIL_SEND_SECONDS.observe(time.perf_counter() - started, outcome="sent")
+            logger.info("Email sent successfully.", extra={"recipient": email.recipient})
+            return
+
+    def _disconnect(self):
+        if self._connection is None:
+            return
+        try:
+            self._connection.quit()
+        except Exception:
+            self._connection.close()
+        self._connection = None
+
+
+# Process-wide delivery queue used for itinerary emails.
+email_queue = EmailDeliveryQueue()
+registry.add_collector(lambda: EMAIL_QUEUE_DEPTH.set(email_queue.depth()))
+# Give queued emails a moment to go out when the process stops.
+atexit.register(email_queue.drain, 10)
@@ -0,0 +1,60 @@
+import logging
+import threading
+import time
+
+from config import AMADEUS_RECORD_MODE
+
+logger = logging.getLogger(__name__)
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def get_engine(mode, offer_ttl_seconds=None):
+    """
+    Return the shared FlightEngine for a flight_type mode, creating it on first use.
+    Engines hold no per-search state, so every request and thread can share them.
+    flight_engine (and with it requests and sqlite3) is only imported here, which
+    keeps importing the app cheap. offer_ttl_seconds gives an engine whose offers
+    stay cached for that long, such as the cache warmer's.
+    """
+    with _engines_lock:
+        engine = _engines.get((mode, offer_ttl_seconds))
+        if engine is None:
+            from flight_engine import FlightEngine
+            engine = _engines[(mode, offer_ttl_seconds)] = FlightEngine(mode, offer_ttl_seconds)
+        return engine
+
+
+def warm_up(modes=("direct", "stops")):
+    """
+    Do the work the first search would otherwise pay for: import and create the
+    engines, open the record/replay store, start the prefetch pool and fetch an
+    Amadeus access token. Meant for gunicorn's post_fork hook. Failures are logged
+    and left for the first request to retry, so a slow or unreachable Amadeus never
+    stops a worker from booting.
+    """
+    started = time.perf_counter()
+    for mode in modes:
+        get_engine(mode)
+
+    from prefetch import _get_executor
+    _get_executor()
+
+    try:
+        if AMADEUS_RECORD_MODE != "off":
+            from response_store import get_response_store
+            get_response_store()
+        if AMADEUS_RECORD_MODE != "replay":
+            from amadeus_client import get_amadeus_client
+            get_amadeus_client().warm_up()
+    except Exception as error:
+        logger.warning("Warm-up could not finish, the first request will retry: %s", error)
+    logger.info("Warm-up finished", extra={"duration_ms": round((time.perf_counter() - started) * 1000)})
+
+
+def warm_up_in_background(modes=("direct", "stops")):
+    """Run warm_up() on a daemon thread so the worker can start serving right away."""
+    thread = threading.Thread(target=warm_up, args=(modes,), name="warm-up", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,208 @@
+import logging
+import time
+from datetime import datetime, timedelta
+from airports import get_timezone
+from cache import offer_cache
+from destinations import CONTINENT_LAYERS, buffer_hours, EXTRA_TRAVEL_TIME
+from metrics import LEG_DECODE_SECONDS, LEG_OFFERS, QUERY_REUSES
+from offer_index import LegOffers, parse_duration
+from prefetch import departure_window, prefetch_legs
+from query_planner import FULL_QUERY, fetch_planned_offers, plan_query, query_filters
+from rate_limiter import DeadlineExceededError, amadeus_scheduler
+from shared_cache import get_shared_offer_cache
+from search_engine import find_best_itinerary, print_itinerary
+
+logger = logging.getLogger(__name__)
+
+
+def direct_only_filter(flight):
+    """Keep offers with a single segment and no stop within it."""
+    segments = flight['itineraries'][0]['segments']
+    return len(segments) == 1 and segments[0].get("numberOfStops", 0) == 0
+
+
+def with_stops_filter(flight):
+    """Keep single-segment offers, including ones with a technical stop."""
+    return len(flight['itineraries'][0]['segments']) == 1
+
+
+# Leg filters by flight_type; every filter runs over the same cached offers.
+LEG_FILTERS = {
+    "direct": direct_only_filter,
+    "stops": with_stops_filter,
+}
+
+
+class FlightEngine:
+    def __init__(self, mode, offer_ttl_seconds=None):
+        """
+        Itinerary engine for one flight_type.
+        :param mode: A key of LEG_FILTERS, e.g. "direct" or "stops".
+        :param offer_ttl_seconds: How long the offers this engine loads stay cached;
+            the offer caches' own TTLs when None.
+        """
+        self.mode = mode
+        self.offer_ttl_seconds = offer_ttl_seconds
+        self.leg_filter = LEG_FILTERS[mode]
+        self.query = plan_query(mode)
+
+    def get_timezone(self, iata_code):
+        return get_timezone(iata_code)
+
+    def parse_duration(self, duration_str):
+        return parse_duration(duration_str)
+
+    def fetch_offers(self, origin, destination, departure_date, currency="USD"):
+        """
+        Return the decoded offers for one leg as a LegOffers index, going through the
+        shared offer cache so each (origin, destination, date, currency) is requested
+        from Amadeus and decoded once per planned query. A mode with a narrowed query
+        uses the full query's offers instead when they are already cached. A miss goes
+        to the host-wide shared cache, when one is configured, before Amadeus.
+        """
+        if self.query != FULL_QUERY and offer_cache.contains(self._offer_key(origin, destination, departure_date,
+                                                                               currency, FULL_QUERY)):
+            QUERY_REUSES.inc(query=self.query)
+            return self._load_offers(origin, destination, departure_date, currency, FULL_QUERY)
+        return self._load_offers(origin, destination, departure_date, currency, self.query)
+
+    @staticmethod
+    def _offer_key(origin, destination, departure_date, currency, query):
+        return (origin, destination, departure_date, currency, query)
+
+    def _load_offers(self, origin, destination, departure_date, currency, query):
+        loaded = []
+
+        def load():
+            offers = fetch_planned_offers(origin, destination, departure_date, currency, query)
+            if offers is None:
+                return self._load_offers(origin, destination, departure_date, currency, FULL_QUERY)
+            started = time.perf_counter()
+            leg = LegOffers.decode(origin, destination, offers, query_filters(query, LEG_FILTERS),
+                                   get_timezone(origin), get_timezone(destination))
+            LEG_DECODE_SECONDS.observe(time.perf_counter() - started, query=query)
+            LEG_OFFERS.observe(len(offers), query=query)
+            return leg
+
+        key = self._offer_key(origin, destination, departure_date, currency, query)
+        shared_cache = get_shared_offer_cache()
+        ttl_seconds = self.offer_ttl_seconds
+
+        def shared_load():
+            loaded.append(True)
+            if shared_cache is None:
+                return load()
+            try:
+                return shared_cache.get_or_load(key, load, ttl_seconds, amadeus_scheduler.time_left())
+            except TimeoutError:
+                raise DeadlineExceededError(f"The search deadline passed while waiting for the offers of {key}.")
+
+        def cached_load():
+            # Waiting on another search's load ends with this search's deadline too.
+            try:
+                return offer_cache.get_or_load(key, shared_load, ttl_seconds, amadeus_scheduler.time_left())
+            except TimeoutError:
+                raise DeadlineExceededError(f"The search deadline passed while waiting for the offers of {key}.")
+
+        try:
+            return cached_load()
+        except DeadlineExceededError:
+            time_left = amadeus_scheduler.time_left()
+            if loaded or (time_left is not None and time_left <= 0):
+                raise
+            # The load this call waited on belonged to another search, whose deadline was the one that passed.
+            return cached_load()
+
+    def fetch_window(self, origin, destination, departure_dates, currency="USD"):
+        """
+        Make sure the offers for every date of a departure window are cached,
+        fetching the missing dates as one concurrent batch.
+        """
+        queries = {self.query, FULL_QUERY}
+        missing = [
+            departure_date for departure_date in departure_dates
+            if not any(offer_cache.contains(self._offer_key(origin, destination, departure_date, currency, query))
+                       for query in queries)
+        ]
+        if len(missing) > 1:
+            prefetch_legs(self, [(origin, destination, departure_date) for departure_date in missing])
+
+    def get_earliest_direct_flight(self, origin, destination, min_departure_time):
+        """
+        Return the earliest flight leaving at or after min_departure_time within the
+        DEPARTURE_WINDOW_DAYS days starting on its date, or None. The returned dict
+        is shared with the offer cache, so copy it before changing it.
+        Routes Amadeus does not serve count as having no flights; any other
+        AmadeusError propagates, since the failed day might have held the earliest flight.
+        """
+        departure_dates = departure_window(min_departure_time)
+        self.fetch_window(origin, destination, departure_dates)
+        for departure_date in departure_dates:
+            leg = self.fetch_offers(origin, destination, departure_date)
+            flight = leg.earliest(self.mode, min_departure_time)
+            if flight:
+                return flight
+        return None
+
+    def simulate_itinerary(self, start_origin, sequence, start_time):
+        """
+        Given a starting origin, a sequence (tuple) of destination IATA codes,
+        and a starting time, simulate the itinerary.
+        Returns itinerary details (or None if any flight in the sequence is missing).
+        """
+        origin = start_origin
+        flights = []
+        total_flight_duration = timedelta()
+        total_layover_duration = timedelta()
+        total_cost = 0.0
+        previous_arrival_time = start_time
+        previous_destination = origin
+
+        for destination in sequence:
+            flight = self.get_earliest_direct_flight(origin, destination, previous_arrival_time + timedelta(hours=buffer_hours[origin]))
+            if flight:
+                layover_duration = flight['departure_time'] - previous_arrival_time
+                total_layover_duration += layover_duration
+                flights.append({**flight, "layover": layover_duration, "layover_iata": previous_destination})
+                total_flight_duration += flight['duration']
+                total_cost += flight['cost']
+                previous_arrival_time = flight['arrival_time']
+                origin = destination
+                previous_destination = destination
+            else:
+                return None  # Itinerary not possible for this sequence
+
+        total_travel_time = total_flight_duration + total_layover_duration + EXTRA_TRAVEL_TIME
+        return {
+            "flights": flights,
+            "total_flight_duration": total_flight_duration,
+            "total_layover_duration": total_layover_duration,
+            "total_travel_time": total_travel_time,
+            "total_cost": total_cost
+        }
+
+def run_cli(flight_instance):
+    """Prompt for a search on stdin and print the best itinerary found by flight_instance."""
+    # Get user inputs
+    start_origin = input("Enter origin airport code (e.g., JFK): ").upper().strip()
+    departure_date = input("Enter departure date (YYYY-MM-DD): ").strip()
+    # Note: This prompt text has been changed to indicate it's your arrival time in Chile.
+    departure_time = input("Enter arrival time in Chile (HH:MM, 24-hour format): ").strip()
+
+    try:
+        current_time = datetime.strptime(f"{departure_date} {departure_time}", "%Y-%m-%d %H:%M")
+        current_time = get_timezone(start_origin).localize(current_time)
+    except ValueError:
+        print("Invalid date or time format. Please use YYYY-MM-DD for date and HH:MM for time.")
+        return
+
+    result = find_best_itinerary(flight_instance, start_origin, CONTINENT_LAYERS, current_time)
+
+    # Determine the best itinerary (shortest total travel time) among valid ones.
+    if result:
+        best_sequence, best_itinerary = result
+        print("\nBest Itinerary Found:")
+        print(f"Sequence: {best_sequence}")
+        print_itinerary(best_itinerary)
+    else:
+        print("\nNo valid itineraries were found across all sequences.")
@@ -0,0 +1,16 @@
+"""
+gunicorn reads this file from the working directory on start; settings given on
+the command line (bind, workers, timeout) still take precedence.
+"""
+from config import CACHE_WARMING_IN_PROCESS, WARM_UP_ON_FORK
+
+
+def post_fork(server, worker):
+    # Runs in each worker right after it is forked, so the threads, connection
+    # pool and token it creates belong to that worker alone.
+    if WARM_UP_ON_FORK:
+        from engines import warm_up_in_background
+        warm_up_in_background()
+    if CACHE_WARMING_IN_PROCESS:
+        from cache_warmer import CacheWarmer
+        CacheWarmer().start()
@@ -0,0 +1,216 @@
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type_name = "untyped"
+
+    def __init__(self, name, documentation, labelnames=()):
+        """
+        :param name: Prometheus metric name.
+        :param documentation: HELP text.
+        :param labelnames: Names of the labels every sample must be given.
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple((name, labels[name]) for name in self.labelnames)
+
+    def samples(self):
+        """Yield (name, labels, value) for every sample."""
+        with self._lock:
+            values = dict(self._values)
+        for key, value in values.items():
+            yield self.name, key, value
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def set(self, value, **labels):
+        """Report a running total kept somewhere else, e.g. a cache's own hit counter."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Gauge(_Metric):
+    type_name = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+                    break
+            self._values[key] = (counts, total + value)
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the wall-clock duration of the with block, in seconds."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self):
+        with self._lock:
+            values = {key: (list(counts), total) for key, (counts, total) in self._values.items()}
+        for key, (counts, total) in values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                yield f"{self.name}_bucket", key + (("le", _format_value(bound)),), cumulative
+            yield f"{self.name}_sum", key, total
+            yield f"{self.name}_count", key, cumulative
+
+
+class Registry:
+    def __init__(self):
+        """Metrics exposed in the Prometheus text format, plus collectors that refresh gauges at scrape time."""
+        self._metrics = []
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, collector):
+        """Call collector() before every render, e.g. to copy cache stats into gauges."""
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics)
+            collectors = list(self._collectors)
+        for collector in collectors:
+            collector()
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {_escape(metric.documentation)}")
+            lines.append(f"# TYPE {metric.name} {metric.type_name}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Process-wide registry behind /api/metrics.
+registry = Registry()
+
+AMADEUS_REQUEST_SECONDS = registry.histogram(
+    "amadeus_request_duration_seconds", "Latency of single Amadeus HTTP requests.", ("endpoint",)
+)
+AMADEUS_REQUESTS = registry.counter(
+    "amadeus_requests_total", "Amadeus HTTP requests by endpoint and status code.", ("endpoint", "status")
+)
+AMADEUS_RESPONSE_BYTES = registry.histogram(
+    "amadeus_flight_offers_response_bytes", "Body size of flight-offers responses by planned query.", ("query",),
+    buckets=(1000, 5000, 10000, 25000, 50000, 100000, 250000, 500000, 1000000, 2500000),
+)
+LEG_DECODE_SECONDS = registry.histogram(
+    "leg_decode_duration_seconds", "Time taken to decode one leg's flight offers by planned query.", ("query",),
+    buckets=(0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25),
+)
+LEG_OFFERS = registry.histogram(
+    "leg_offers", "Flight offers Amadeus returned for one leg by planned query.", ("query",),
+    buckets=(0, 1, 5, 10, 25, 50, 100, 250),
+)
+QUERY_FALLBACKS = registry.counter(
+    "amadeus_query_fallbacks_total", "Narrowed flight-offers queries that fell back to the full query.",
+    ("query", "reason"),
+)
+QUERY_REUSES = registry.counter(
+    "amadeus_query_reuses_total", "Narrowed-query leg lookups answered from cached full-query offers.", ("query",)
+)
+LEG_FETCH_ERRORS = registry.counter(
+    "leg_fetch_errors_total", 'Failed leg fetches by kind: "no_service" ones are cached as empty legs.', ("kind",)
+)
+CIRCUIT_STATE = registry.gauge(
+    "circuit_breaker_state", "Circuit breaker state per endpoint: 0 closed, 1 open, 2 half-open.", ("endpoint",)
+)
+CIRCUIT_REJECTIONS = registry.counter(
+    "circuit_breaker_rejections_total", "Requests failed fast by an open circuit breaker.", ("endpoint",)
+)
+SEARCH_SECONDS = registry.histogram(
+    "search_duration_seconds", "Wall-clock time of a whole itinerary search.", ("flight_type",)
+)
+SEARCH_AMADEUS_CALLS = registry.histogram(
+    "search_amadeus_calls", "Amadeus requests made by one search.", ("flight_type",),
+    buckets=(0, 10, 25, 50, 100, 150, 200, 300, 500, 1000, 2500),
+)
+SEQUENCES_EVALUATED = registry.counter(
+    "search_sequences_evaluated_total", "Destination sequences completed or ruled out.", ("strategy",)
+)
+SEQUENCES_FEASIBLE = registry.counter(
+    "search_sequences_feasible_total",
+    "Destination sequences that produced a full itinerary; ranked searches only count the unpruned ones.",
+    ("strategy",),
+)
+EMAIL_SEND_SECONDS = registry.histogram(
+    "email_send_duration_seconds", "Time taken to send an itinerary email.", ("outcome",)
+)
+CACHE_HITS = registry.counter("cache_hits_total", "Cache lookups answered from the cache.", ("cache",))
+CACHE_MISSES = registry.counter("cache_misses_total", "Cache lookups that had to load.", ("cache",))
+CACHE_HIT_RATIO = registry.gauge("cache_hit_ratio", "Hits over lookups since start.", ("cache",))
+CACHE_ENTRIES = registry.gauge("cache_entries", "Entries currently stored.", ("cache",))
+EMAIL_QUEUE_DEPTH = registry.gauge("email_queue_depth", "Emails waiting for delivery.")
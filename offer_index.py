@@ -0,0 +1,133 @@
+import re
+from array import array
+from bisect import bisect_left
+from datetime import datetime, timedelta
+
+import pytz
+
+_DURATION_PATTERN = re.compile(r'PT(?:(\d+)H)?(?:(\d+)M)?')
+_EPOCH = datetime(1970, 1, 1)
+
+
+def parse_duration(duration_str):
+    """Parse an ISO 8601 duration such as "PT8H30M" into a timedelta."""
+    match = _DURATION_PATTERN.match(duration_str)
+    hours = int(match.group(1)) if match.group(1) else 0
+    minutes = int(match.group(2)) if match.group(2) else 0
+    return timedelta(hours=hours, minutes=minutes)
+
+
+def to_epoch(local_at, tz=pytz.utc):
+    """Seconds since the epoch for an Amadeus "YYYY-MM-DDTHH:MM:SS" time, local to the pytz timezone tz."""
+    local_time = datetime.strptime(local_at, "%Y-%m-%dT%H:%M:%S")
+    if tz is pytz.utc:
+        return int((local_time - _EPOCH).total_seconds())
+    return int(tz.localize(local_time).timestamp())
+
+
+class LegOffers:
+    """
+    The offers for one leg and date, decoded once into parallel arrays sorted by
+    departure, with one departure index per leg filter. Finding the earliest
+    departure at or after a time is a bisect and returns a shared, pre-built
+    flight dict, so callers must copy it before changing it. Times are kept as
+    true UTC epochs and shown in each airport's own timezone.
+    """
+
+    __slots__ = ("origin", "destination", "origin_tz", "destination_tz", "departures", "arrivals", "durations",
+                 "costs", "airlines", "flight_numbers", "_flights", "_filter_departures", "_filter_positions")
+
+    def __init__(self, origin, destination, origin_tz=pytz.utc, destination_tz=pytz.utc):
+        self.origin = origin
+        self.destination = destination
+        self.origin_tz = origin_tz
+        self.destination_tz = destination_tz
+        self.departures = array("q")
+        self.arrivals = array("q")
+        self.durations = array("q")
+        self.costs = array("d")
+        self.airlines = []
+        self.flight_numbers = []
+        self._flights = []
+        self._filter_departures = {}
+        self._filter_positions = {}
+
+    @classmethod
+    def decode(cls, origin, destination, offers, leg_filters, origin_tz=pytz.utc, destination_tz=pytz.utc):
+        """
+        Build the index from raw Amadeus flight offers.
+        :param leg_filters: Mapping of filter name to a predicate over a raw offer;
+            offers no filter accepts are dropped.
+        :param origin_tz: pytz timezone of the origin airport, which departure times are local to.
+        :param destination_tz: pytz timezone of the destination airport, which arrival times are local to.
+        """
+        leg = cls(origin, destination, origin_tz, destination_tz)
+        decoded = []
+        for position, offer in enumerate(offers or []):
+            accepted = [name for name, leg_filter in leg_filters.items() if leg_filter(offer)]
+            if not accepted:
+                continue
+            segment = offer['itineraries'][0]['segments'][0]
+            # Sorting on the raw "at" string with the original position as tie-breaker
+            # keeps the order the engines have always picked from.
+            decoded.append((segment['departure']['at'], position, offer, segment, accepted))
+        decoded.sort(key=lambda item: (item[0], item[1]))
+
+        for index, (departure_at, _, offer, segment, accepted) in enumerate(decoded):
+            leg.departures.append(to_epoch(departure_at, origin_tz))
+            leg.arrivals.append(to_epoch(segment['arrival']['at'], destination_tz))
+            leg.durations.append(int(parse_duration(segment['duration']).total_seconds()))
+            leg.costs.append(float(offer['price']['total']))
+            leg.airlines.append(offer['validatingAirlineCodes'][0])
+            leg.flight_numbers.append(segment['carrierCode'] + segment['number'])
+            leg._flights.append(None)
+            for name in accepted:
+                leg._filter_departures.setdefault(name, array("q")).append(leg.departures[index])
+                leg._filter_positions.setdefault(name, array("I")).append(index)
+        return leg
+
+    def __len__(self):
+        return len(self.departures)
+
+    def __getstate__(self):
+        # The flight dicts are rebuilt on demand, so only the arrays are pickled.
+        return {name: getattr(self, name) for name in self.__slots__ if name != "_flights"}
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+        self._flights = [None] * len(self.departures)
+
+    def earliest_index(self, filter_name, min_departure_epoch):
+        """Index of the earliest offer passing filter_name that departs at or after the epoch, or -1."""
+        departures = self._filter_departures.get(filter_name)
+        if not departures:
+            return -1
+        found = bisect_left(departures, min_departure_epoch)
+        if found == len(departures):
+            return -1
+        return self._filter_positions[filter_name][found]
+
+    def flight(self, index):
+        """The flight dict for an offer index, built on first use."""
+        flight = self._flights[index]
+        if flight is None:
+            flight = {
+                "airline": self.airlines[index],
+                "flight_number": self.flight_numbers[index],
+                "departure_time": datetime.fromtimestamp(self.departures[index], self.origin_tz),
+                "arrival_time": datetime.fromtimestamp(self.arrivals[index], self.destination_tz),
+                "origin": self.origin,
+                "destination": self.destination,
+                "duration": timedelta(seconds=self.durations[index]),
+                "cost": self.costs[index]
+            }
+            self._flights[index] = flight
+        return flight
+
+    def earliest(self, filter_name, min_departure_time):
+        """The earliest flight passing filter_name that departs at or after min_departure_time, or None."""
+        index = self.earliest_index(filter_name, min_departure_time.timestamp())
+        if index < 0:
+            return None
+        return self.flight(index)
@@ -0,0 +1,122 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import timedelta
+
+from config import DEPARTURE_WINDOW_DAYS, PREFETCH_CONCURRENCY
+from amadeus_errors import AmadeusError
+from destinations import buffer_hours
+from rate_limiter import DeadlineExceededError, amadeus_scheduler
+
+logger = logging.getLogger(__name__)
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    """Return the process-wide prefetch pool, creating it on first use."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=PREFETCH_CONCURRENCY, thread_name_prefix="leg-prefetch")
+        return _executor
+
+
+def _fetch_leg(flight_instance, origin, destination, departure_date, context, deadline):
+    if deadline is not None and time.monotonic() >= deadline:
+        # Too late to start a new request; the search gives up on this layer instead.
+        return
+    try:
+        with amadeus_scheduler.bind(**context):
+            flight_instance.fetch_offers(origin, destination, departure_date)
+    except DeadlineExceededError:
+        logger.debug("Search deadline reached before prefetching %s -> %s on %s", origin, destination, departure_date)
+    except Exception as error:
+        # The evaluation pass will ask for this leg again and handle the error there.
+        logger.warning("Error prefetching %s -> %s on %s: %s", origin, destination, departure_date, error)
+
+
+def prefetch_legs(flight_instance, legs, priority=None, deadline=None):
+    """
+    Fetch every (origin, destination, departure_date) leg into the offer cache in
+    parallel and block until all of them have finished. The calls keep the
+    caller's search id, priority and deadline for the rate limiter unless a priority is given.
+    Legs whose fetch has not started by deadline, a time.monotonic() value, are skipped.
+    Under a bound search deadline this waits no longer than it, cancelling the legs
+    still queued and raising DeadlineExceededError.
+    """
+    legs = set(legs)
+    if not legs:
+        return
+    context = amadeus_scheduler.current_context()
+    if priority is not None:
+        context["priority"] = priority
+    executor = _get_executor()
+    futures = [
+        executor.submit(_fetch_leg, flight_instance, origin, destination, departure_date, context, deadline)
+        for origin, destination, departure_date in legs
+    ]
+    time_left = amadeus_scheduler.time_left()
+    _, not_done = wait(futures, timeout=None if time_left is None else max(0.0, time_left))
+    if not_done:
+        for future in not_done:
+            future.cancel()
+        raise DeadlineExceededError("The search deadline passed while its legs were being prefetched.")
+
+
+def departure_window(min_departure_time, days=DEPARTURE_WINDOW_DAYS):
+    """Return the departure dates searched for a leg, starting on min_departure_time's date."""
+    return [(min_departure_time + timedelta(days=offset)).strftime("%Y-%m-%d") for offset in range(max(1, days))]
+
+
+def plan_layer_legs(states, layer):
+    """
+    Return the legs needed to leave each (airport, arrival_time) state towards
+    every airport of the next layer, for every date of the departure window.
+    """
+    legs = set()
+    for airport, arrival_time in states:
+        departure_dates = departure_window(arrival_time + timedelta(hours=buffer_hours[airport]))
+        for destination in layer:
+            for departure_date in departure_dates:
+                legs.add((airport, destination, departure_date))
+    return legs
+
+
+def prefetch_search(flight_instance, start_origin, layers, start_time, base_priority=0):
+    """
+    Prefetch every leg a search over these layers can touch, one layer at a time.
+    The set of reachable (airport, arrival_time) states only depends on earliest
+    departures, so after each parallel batch the next layer's legs are known exactly.
+    Deeper layers get a higher rate-limiter priority, since their legs are the ones
+    that complete itineraries; base_priority shifts the whole search up or down.
+    """
+    prefetch_searches(flight_instance, [(start_origin, start_time)], layers, base_priority)
+
+
+def prefetch_searches(flight_instance, starts, layers, base_priority=0):
+    """
+    Prefetch the legs of several searches at once, given as (start_origin, start_time)
+    pairs. Their states are merged layer by layer, so each layer is one parallel batch
+    over the union of the searches' legs and a leg they share is fetched only once.
+    A leg Amadeus fails to answer is not followed further; the searches themselves
+    ask for it again and report the error.
+    """
+    states = set(starts)
+    for depth, layer in enumerate(layers):
+        prefetch_legs(flight_instance, plan_layer_legs(states, layer), priority=base_priority + depth)
+        next_states = set()
+        for airport, arrival_time in states:
+            min_departure_time = arrival_time + timedelta(hours=buffer_hours[airport])
+            for destination in layer:
+                try:
+                    flight = flight_instance.get_earliest_direct_flight(airport, destination, min_departure_time)
+                except AmadeusError as error:
+                    logger.warning("Error prefetching %s -> %s: %s", airport, destination, error)
+                    continue
+                if flight:
+                    next_states.add((destination, flight['arrival_time']))
+        if not next_states:
+            return
+        states = next_states
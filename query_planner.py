@@ -0,0 +1,93 @@
+"""
+Chooses the Amadeus flight-offers query behind each leg a search fetches.
+
+Every mode can be answered from the full query, but direct searches only ever
+use non-stop offers, so they ask Amadeus for those alone and for fewer of them.
+Amadeus sorts offers by price rather than departure time, so a narrowed answer
+that fills its whole `max` may be missing the earliest flight and the leg falls
+back to the full query. An empty non-stop answer is final: the full query's
+offers would have no non-stop flight either.
+"""
+import logging
+
+from config import AMADEUS_MAX_RESULTS, AMADEUS_NONSTOP_MAX_RESULTS, QUERY_PLANNING_ENABLED
+from amadeus_errors import NO_SERVICE, AmadeusError
+from metrics import LEG_FETCH_ERRORS, QUERY_FALLBACKS
+
+logger = logging.getLogger(__name__)
+
+FULL_QUERY = "full"
+NONSTOP_QUERY = "nonstop"
+
+# Flight-offers parameters of each query and the leg filters its offers can answer; None means all of them.
+QUERY_PLANS = {
+    FULL_QUERY: {"non_stop": False, "max_results": AMADEUS_MAX_RESULTS, "filters": None},
+    NONSTOP_QUERY: {"non_stop": True, "max_results": AMADEUS_NONSTOP_MAX_RESULTS, "filters": ("direct",)},
+}
+
+# The narrowest query each flight_type can be answered from.
+MODE_QUERIES = {
+    "direct": NONSTOP_QUERY,
+    "stops": FULL_QUERY,
+}
+
+
+def plan_query(mode, enabled=QUERY_PLANNING_ENABLED):
+    """The query legs of a flight_type are fetched with; the full query when planning is disabled."""
+    if not enabled:
+        return FULL_QUERY
+    return MODE_QUERIES.get(mode, FULL_QUERY)
+
+
+def fetch_order(modes, enabled=QUERY_PLANNING_ENABLED):
+    """
+    The flight_types of one search in the order to run them: those fetched with the
+    full query first, so the narrowed ones reuse the full offers they leave cached.
+    """
+    return sorted(modes, key=lambda mode: plan_query(mode, enabled) != FULL_QUERY)
+
+
+def query_filters(query, leg_filters):
+    """The subset of leg_filters (name -> predicate) that offers fetched by query can answer."""
+    names = QUERY_PLANS[query]["filters"]
+    if names is None:
+        return leg_filters
+    return {name: leg_filters[name] for name in names}
+
+
+def fetch_planned_offers(origin, destination, departure_date, currency, query):
+    """
+    Fetch the raw flight offers for one leg with a planned query.
+    Returns None when a narrowed query's answer cannot be trusted and the leg
+    has to be fetched with the full query instead.
+    """
+    # Imported here, where legs are fetched, so planning a search does not load requests and sqlite3.
+    from response_store import ReplayMissError, fetch_flight_offers
+
+    plan = QUERY_PLANS[query]
+    try:
+        offers = fetch_flight_offers(origin, destination, departure_date, currency=currency,
+                                     max_results=plan["max_results"], non_stop=plan["non_stop"])
+    except ReplayMissError:
+        if query == FULL_QUERY:
+            raise
+        # Recordings made before planning hold the full query only.
+        return _fall_back(origin, destination, departure_date, query, "replay_miss")
+    except AmadeusError as error:
+        LEG_FETCH_ERRORS.inc(kind=error.kind)
+        if error.kind != NO_SERVICE:
+            raise
+        # Asking again gets the same rejection, so the leg is treated, and cached, as having no offers.
+        logger.info("No service %s -> %s on %s: %s", origin, destination, departure_date, error)
+        offers = []
+
+    if query != FULL_QUERY and len(offers) >= plan["max_results"]:
+        return _fall_back(origin, destination, departure_date, query, "truncated")
+    return offers
+
+
+def _fall_back(origin, destination, departure_date, query, reason):
+    QUERY_FALLBACKS.inc(query=query, reason=reason)
+    logger.debug("Falling back to the full query for %s -> %s on %s", origin, destination, departure_date,
+                 extra={"query": query, "reason": reason})
+    return None
@@ -0,0 +1,221 @@
+import heapq
+import math
+from bisect import bisect_left, bisect_right
+from datetime import timedelta
+
+from config import RANKING_COST_WEIGHT, RANKING_TIME_WEIGHT
+from destinations import buffer_hours, EXTRA_TRAVEL_TIME
+from metrics import SEQUENCES_EVALUATED, SEQUENCES_FEASIBLE
+from prefetch import prefetch_search
+from rate_limiter import DeadlineExceededError, amadeus_scheduler
+
+OBJECTIVES = ("time", "cost", "weighted")
+
+
+class Objective:
+    def __init__(self, name="time", time_weight=RANKING_TIME_WEIGHT, cost_weight=RANKING_COST_WEIGHT):
+        """
+        How itineraries are scored; lower is better.
+        :param name: "time" ranks by total travel time, "cost" by total cost with travel
+            time breaking ties, "weighted" by time_weight * hours + cost_weight * cost.
+        :param time_weight: Weight of one hour of travel in the weighted score.
+        :param cost_weight: Weight of one unit of cost in the weighted score.
+        """
+        if name not in OBJECTIVES:
+            raise ValueError(f"Unknown ranking objective: {name}")
+        if time_weight < 0 or cost_weight < 0:
+            raise ValueError("Ranking weights must not be negative.")
+        self.name = name
+        self.time_weight = time_weight
+        self.cost_weight = cost_weight
+
+    def score(self, travel_seconds, cost):
+        """Score for a travel time in seconds and a cost. Both only grow as legs are added,
+        so the score of a partial sequence is a lower bound for all of its completions."""
+        if self.name == "time":
+            return (travel_seconds,)
+        if self.name == "cost":
+            return (cost, travel_seconds)
+        return (self.time_weight * travel_seconds / 3600 + self.cost_weight * cost,)
+
+    def itinerary_score(self, itinerary):
+        return self.score(itinerary["total_travel_time"].total_seconds(), itinerary["total_cost"])
+
+
+class _Entry:
+    """Heap entry ordered worst first: higher score, then later in product order."""
+
+    __slots__ = ("score", "ordinal", "item")
+
+    def __init__(self, score, ordinal, item):
+        self.score = score
+        self.ordinal = ordinal
+        self.item = item
+
+    def __lt__(self, other):
+        return (self.score, self.ordinal) > (other.score, other.ordinal)
+
+
+class TopK:
+    def __init__(self, k):
+        """
+        The k best items seen so far, kept in a heap of at most k entries.
+        Items offered in increasing ordinal order lose ties to earlier ones.
+        """
+        self.k = k
+        self._heap = []
+
+    def admits(self, score):
+        """Whether an item with this score would still make the cut."""
+        return len(self._heap) < self.k or score < self._heap[0].score
+
+    def push(self, score, ordinal, item):
+        if not self.admits(score):
+            return False
+        entry = _Entry(score, ordinal, item)
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, entry)
+        else:
+            heapq.heapreplace(self._heap, entry)
+        return True
+
+    def best(self):
+        return min(self._heap, key=lambda entry: (entry.score, entry.ordinal)).item if self._heap else None
+
+    def items(self):
+        """Return the kept items, best first."""
+        return [entry.item for entry in sorted(self._heap, key=lambda entry: (entry.score, entry.ordinal))]
+
+
+class ParetoFrontier:
+    def __init__(self):
+        """
+        Items no other item beats on both travel time and cost, sorted by travel
+        time with cost strictly decreasing. Of two equal points the first one stays.
+        """
+        self._seconds = []
+        self._costs = []
+        self._items = []
+
+    def dominated(self, seconds, cost):
+        """Whether a point at least this good on both axes is already on the frontier."""
+        # The last point that is no slower has the lowest cost of all points that are no slower.
+        position = bisect_right(self._seconds, seconds)
+        return position > 0 and self._costs[position - 1] <= cost
+
+    def add(self, seconds, cost, item):
+        if self.dominated(seconds, cost):
+            return False
+        position = bisect_left(self._seconds, seconds)
+        end = position
+        while end < len(self._costs) and self._costs[end] >= cost:
+            end += 1
+        self._seconds[position:end] = [seconds]
+        self._costs[position:end] = [cost]
+        self._items[position:end] = [item]
+        return True
+
+    def items(self):
+        """Return the frontier, fastest first."""
+        return list(self._items)
+
+
+def rank_itineraries(flight_instance, start_origin, layers, start_time, objective=None, top_k=1, pareto=False,
+                     progress=None, deadline=None):
+    """
+    Depth-first search over the sequences in itertools.product order that keeps the
+    top_k itineraries by objective and, if pareto is set, the travel time vs cost
+    Pareto frontier. Sequences sharing a prefix share its legs, and a prefix is
+    dropped as soon as neither the top_k heap nor the frontier could take any of
+    its completions, so only O(top_k + frontier) itineraries are ever held.
+    Every leg the sequences can reach is prefetched in parallel first.
+
+    Returns {"ranked": [...], "pareto": [...] or None, "sequences_pruned": n, "coverage": {...}},
+    where the lists hold (sequence, itinerary) tuples, best or fastest first.
+    progress, if given, is called as progress(evaluated, total, best) as sequences
+    are completed or ruled out.
+
+    deadline, a time.monotonic() value, bounds every Amadeus call of the search like
+    in anytime_search. When it cuts the search short, the itineraries completed so
+    far are returned and coverage says the ranking is not complete.
+    """
+
+    objective = objective or Objective()
+    ranked = TopK(top_k)
+    frontier = ParetoFrontier() if pareto else None
+    total = math.prod(len(layer) for layer in layers)
+    subtree_sizes = [math.prod(len(rest) for rest in layers[depth + 1:]) for depth in range(len(layers))]
+    # Every remaining stop costs at least the smallest buffer of its layer in layover time.
+    remaining_buffers = [
+        sum(min(buffer_hours[airport] for airport in layer) for layer in layers[depth:-1]) * 3600
+        for depth in range(len(layers))
+    ] + [0]
+    extra_seconds = EXTRA_TRAVEL_TIME.total_seconds()
+    counters = {"evaluated": 0, "pruned": 0, "completed": 0}
+    flights = []
+
+    def report():
+        if progress:
+            progress(counters["evaluated"], total, ranked.best())
+
+    def can_improve(seconds, cost):
+        if ranked.admits(objective.score(seconds, cost)):
+            return True
+        return frontier is not None and not frontier.dominated(seconds, cost)
+
+    def visit(depth, airport, arrival_time, elapsed, cost, ordinal):
+        if depth == len(layers):
+            # Only reached when the heap or the frontier takes this itinerary.
+            seconds = elapsed.total_seconds() + extra_seconds
+            sequence = tuple(flight['destination'] for flight in flights)
+            total_flight_duration = sum((flight['duration'] for flight in flights), timedelta())
+            itinerary = {
+                "flights": list(flights),
+                "total_flight_duration": total_flight_duration,
+                "total_layover_duration": elapsed - total_flight_duration,
+                "total_travel_time": elapsed + EXTRA_TRAVEL_TIME,
+                "total_cost": cost
+            }
+            ranked.push(objective.score(seconds, cost), ordinal, (sequence, itinerary))
+            if frontier is not None:
+                frontier.add(seconds, cost, (sequence, itinerary))
+            counters["evaluated"] += 1
+            counters["completed"] += 1
+            report()
+            return
+
+        min_departure_time = arrival_time + timedelta(hours=buffer_hours[airport])
+        for index, destination in enumerate(layers[depth]):
+            child_ordinal = ordinal * len(layers[depth]) + index
+            flight = flight_instance.get_earliest_direct_flight(airport, destination, min_departure_time)
+            if flight:
+                layover_duration = flight['departure_time'] - arrival_time
+                child_elapsed = elapsed + layover_duration + flight['duration']
+                child_cost = cost + flight['cost']
+                bound_seconds = child_elapsed.total_seconds() + extra_seconds
+                if depth + 1 < len(layers):
+                    bound_seconds += buffer_hours[destination] * 3600 + remaining_buffers[depth + 1]
+                if can_improve(bound_seconds, child_cost):
+                    flights.append({**flight, "layover": layover_duration, "layover_iata": airport})
+                    visit(depth + 1, destination, flight['arrival_time'], child_elapsed, child_cost, child_ordinal)
+                    flights.pop()
+                    continue
+                counters["pruned"] += subtree_sizes[depth]
+            counters["evaluated"] += subtree_sizes[depth]
+            report()
+
+    coverage = {"complete": True, "sequences_evaluated": total, "sequences_total": total, "stopped_by": None}
+    try:
+        with amadeus_scheduler.bind(deadline=deadline):
+            prefetch_search(flight_instance, start_origin, layers, start_time)
+            visit(0, start_origin, start_time, timedelta(), 0.0, 0)
+    except DeadlineExceededError:
+        coverage.update(complete=False, sequences_evaluated=counters["evaluated"], stopped_by="deadline")
+    SEQUENCES_EVALUATED.inc(counters["evaluated"], strategy="ranking")
+    SEQUENCES_FEASIBLE.inc(counters["completed"], strategy="ranking")
+    return {
+        "ranked": ranked.items(),
+        "pareto": frontier.items() if frontier is not None else None,
+        "sequences_pruned": counters["pruned"],
+        "coverage": coverage,
+    }
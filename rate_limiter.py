@@ -0,0 +1,309 @@
+import itertools
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from config import (
+    AMADEUS_BURST,
+    AMADEUS_DAILY_BUDGET,
+    AMADEUS_MAX_QUEUE_WAIT_SECONDS,
+    AMADEUS_QUOTA_PATH,
+    AMADEUS_REQUESTS_PER_SECOND,
+)
+
+
+class QuotaExceededError(Exception):
+    """Raised when the daily Amadeus budget is spent or a call waited too long for a slot."""
+
+
+class DeadlineExceededError(Exception):
+    """Raised when an Amadeus call cannot be made before the deadline of the search it belongs to."""
+
+
+class SharedQuota:
+    def __init__(self, path):
+        """
+        Token bucket and daily request count kept in a SQLite file, so every process
+        on the host (each gunicorn worker and the cache warmer) draws from the same
+        limits and the day's count survives restarts.
+        :param path: SQLite database file, created if missing.
+        """
+        self.path = path
+        self._pid = None
+        self._connection = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        """Return this process's connection, reopening it after a fork. Caller holds the lock."""
+        if self._pid != os.getpid():
+            # Imported on first use so importing the app stays free of sqlite3.
+            import sqlite3
+            self._connection = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS quota ("
+                "id INTEGER PRIMARY KEY CHECK (id = 1), tokens REAL NOT NULL, refilled_at REAL NOT NULL, "
+                "day TEXT NOT NULL, used INTEGER NOT NULL)"
+            )
+            self._pid = os.getpid()
+        return self._connection
+
+    @staticmethod
+    def _refilled(row, now, requests_per_second, burst, today):
+        """The (tokens, day, used) of a stored row brought up to now."""
+        if row is None:
+            return float(burst), today, 0
+        tokens, refilled_at, day, used = row
+        tokens = min(burst, tokens + max(0.0, now - refilled_at) * requests_per_second)
+        if day != today:
+            day, used = today, 0
+        return tokens, day, used
+
+    def take(self, requests_per_second, burst, daily_budget, today):
+        """
+        Take one request from the shared bucket.
+        Returns 0 when it was taken, the seconds until the next token is due when
+        the bucket is empty, or None when daily_budget is used up for today.
+        """
+        now = time.time()
+        with self._lock:
+            connection = self._connect()
+            connection.execute("BEGIN IMMEDIATE")
+            with connection:
+                row = connection.execute("SELECT tokens, refilled_at, day, used FROM quota WHERE id = 1").fetchone()
+                tokens, day, used = self._refilled(row, now, requests_per_second, burst, today)
+                if daily_budget and used >= daily_budget:
+                    retry_in = None
+                elif tokens >= 1:
+                    tokens -= 1
+                    used += 1
+                    retry_in = 0.0
+                else:
+                    retry_in = (1 - tokens) / requests_per_second
+                connection.execute(
+                    "INSERT OR REPLACE INTO quota (id, tokens, refilled_at, day, used) VALUES (1, ?, ?, ?, ?)",
+                    (tokens, now, day, used),
+                )
+        return retry_in
+
+    def usage(self, requests_per_second, burst, today):
+        """Return the (tokens available, requests used today) of the shared bucket."""
+        with self._lock:
+            row = self._connect().execute("SELECT tokens, refilled_at, day, used FROM quota WHERE id = 1").fetchone()
+        tokens, _, used = self._refilled(row, time.time(), requests_per_second, burst, today)
+        return tokens, used
+
+
+class _Ticket:
+    __slots__ = ("search_id", "priority", "sequence")
+
+    def __init__(self, search_id, priority, sequence):
+        self.search_id = search_id
+        self.priority = priority
+        self.sequence = sequence
+
+
+class AmadeusScheduler:
+    def __init__(self, requests_per_second=AMADEUS_REQUESTS_PER_SECOND, burst=AMADEUS_BURST,
+                 daily_budget=AMADEUS_DAILY_BUDGET, max_wait_seconds=AMADEUS_MAX_QUEUE_WAIT_SECONDS,
+                 quota_path=AMADEUS_QUOTA_PATH):
+        """
+        Token bucket that every outgoing Amadeus request has to pass.
+        :param requests_per_second: Sustained request rate.
+        :param burst: Bucket size, i.e. how many requests may go out back to back.
+        :param daily_budget: Requests allowed per UTC day; 0 disables the budget.
+        :param max_wait_seconds: How long a call may queue before giving up.
+        :param quota_path: SQLite file holding the bucket and the day's count for every
+            process on the host; empty to keep them in this process only.
+
+        Waiting calls are served highest priority first, then round-robin across
+        searches so one large search cannot starve the others, then in arrival order.
+        """
+        self.requests_per_second = requests_per_second
+        self.burst = max(1, burst)
+        self.daily_budget = daily_budget
+        self.max_wait_seconds = max_wait_seconds
+
+        self._shared = SharedQuota(quota_path) if quota_path else None
+        self._tokens = float(self.burst)
+        self._refilled_at = time.monotonic()
+        self._day = self._today()
+        self._used_today = 0
+        self._granted = 0
+        self._rejected = 0
+        self._wait_seconds = 0.0
+        self._pending = []
+        self._last_served = {}
+        self._calls_by_search = {}
+        self._serve_counter = itertools.count()
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._context = threading.local()
+
+    @staticmethod
+    def _today():
+        return datetime.now(timezone.utc).date()
+
+    @contextmanager
+    def bind(self, search_id=None, priority=None, deadline=None):
+        """
+        Tag the calls made by this thread with a search id, priority and/or deadline,
+        a time.monotonic() value after which the search makes no more calls.
+        """
+        previous = self.current_context()
+        self._context.search_id = previous["search_id"] if search_id is None else search_id
+        self._context.priority = previous["priority"] if priority is None else priority
+        self._context.deadline = previous["deadline"] if deadline is None else deadline
+        try:
+            yield
+        finally:
+            self._context.search_id = previous["search_id"]
+            self._context.priority = previous["priority"]
+            self._context.deadline = previous["deadline"]
+
+    def current_context(self):
+        """Return the search id, priority and deadline bound to this thread, so worker threads can inherit them."""
+        return {
+            "search_id": getattr(self._context, "search_id", None),
+            "priority": getattr(self._context, "priority", 0),
+            "deadline": getattr(self._context, "deadline", None),
+        }
+
+    def time_left(self):
+        """Seconds until the deadline bound to this thread, or None when it has none."""
+        deadline = getattr(self._context, "deadline", None)
+        return None if deadline is None else deadline - time.monotonic()
+
+    def _refill(self, now):
+        """Add the tokens earned since the last refill and reset the day's budget at midnight. Caller holds the lock."""
+        self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.requests_per_second)
+        self._refilled_at = now
+        today = self._today()
+        if today != self._day:
+            self._day = today
+            self._used_today = 0
+
+    def _next_ticket(self):
+        """Pick the waiting call to serve next. Caller holds the lock."""
+        return min(
+            self._pending,
+            key=lambda ticket: (-ticket.priority, self._last_served.get(ticket.search_id, -1), ticket.sequence),
+        )
+
+    def _take_token(self):
+        """
+        Take a token for the next request, from the shared quota when there is one.
+        Returns 0 when taken, the seconds until one is due, or None when the daily
+        budget is used up. Caller holds the lock, which is let go while the shared
+        quota's SQLite write runs so other threads can queue meanwhile.
+        """
+        if self._shared is not None:
+            today = self._day.isoformat()
+            self._condition.release()
+            try:
+                retry_in = self._shared.take(self.requests_per_second, self.burst, self.daily_budget, today)
+            finally:
+                self._condition.acquire()
+            if retry_in == 0:
+                self._used_today += 1
+            return retry_in
+        if self.daily_budget and self._used_today >= self.daily_budget:
+            return None
+        if self._tokens >= 1:
+            self._tokens -= 1
+            self._used_today += 1
+            return 0.0
+        return (1 - self._tokens) / self.requests_per_second
+
+    def acquire(self):
+        """
+        Block until this thread may send one Amadeus request. Raises
+        DeadlineExceededError instead of waiting past the deadline bound to the thread.
+        """
+        context = self.current_context()
+        started = time.monotonic()
+        deadline = started + self.max_wait_seconds
+        search_deadline = context["deadline"]
+        with self._condition:
+            ticket = _Ticket(context["search_id"], context["priority"], next(self._sequence))
+            self._pending.append(ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    if search_deadline is not None and now >= search_deadline:
+                        raise DeadlineExceededError(
+                            "The search deadline passed while waiting for an Amadeus request slot."
+                        )
+                    if now >= deadline:
+                        self._rejected += 1
+                        raise QuotaExceededError(
+                            f"Waited more than {self.max_wait_seconds}s for an Amadeus request slot."
+                        )
+
+                    if self._next_ticket() is ticket:
+                        retry_in = self._take_token()
+                        if retry_in is None:
+                            self._rejected += 1
+                            raise QuotaExceededError(
+                                f"Daily Amadeus budget of {self.daily_budget} requests is used up."
+                            )
+                        if retry_in == 0:
+                            self._granted += 1
+                            self._wait_seconds += now - started
+                            self._last_served[ticket.search_id] = next(self._serve_counter)
+                            if ticket.search_id is not None:
+                                self._calls_by_search[ticket.search_id] = (
+                                    self._calls_by_search.get(ticket.search_id, 0) + 1
+                                )
+                            return
+                        if search_deadline is not None and now + retry_in >= search_deadline:
+                            raise DeadlineExceededError(
+                                "The next Amadeus request slot is due after the search deadline."
+                            )
+                        timeout = retry_in
+                    else:
+                        timeout = deadline - now
+                    if search_deadline is not None:
+                        timeout = min(timeout, search_deadline - now)
+                    self._condition.wait(min(timeout, deadline - now))
+            finally:
+                self._pending.remove(ticket)
+                if not self._pending:
+                    # Fairness only matters between calls that are queued together.
+                    self._last_served.clear()
+                self._condition.notify_all()
+
+    def pop_search_calls(self, search_id):
+        """Return how many requests a search has been granted and stop counting for it."""
+        with self._condition:
+            return self._calls_by_search.pop(search_id, 0)
+
+    def usage(self):
+        """Return the current rate, budget and queue figures."""
+        shared_usage = None
+        if self._shared is not None:
+            shared_usage = self._shared.usage(self.requests_per_second, self.burst, self._today().isoformat())
+        with self._condition:
+            self._refill(time.monotonic())
+            tokens, used_today = shared_usage or (self._tokens, self._used_today)
+            return {
+                "requests_per_second": self.requests_per_second,
+                "burst": self.burst,
+                "tokens_available": round(tokens, 2),
+                "daily_budget": self.daily_budget or None,
+                "used_today": used_today,
+                "remaining_today": max(0, self.daily_budget - used_today) if self.daily_budget else None,
+                "shared": self._shared is not None,
+                "waiting": len(self._pending),
+                "granted": self._granted,
+                "rejected": self._rejected,
+                "average_wait_seconds": (self._wait_seconds / self._granted) if self._granted else 0.0,
+            }
+
+
+# Process-wide scheduler shared by every AmadeusClient request.
+amadeus_scheduler = AmadeusScheduler()
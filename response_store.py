@@ -0,0 +1,95 @@
+import json
+import sqlite3
+import threading
+import time
+import zlib
+
+from amadeus_client import AmadeusError, flight_offer_params, get_amadeus_client
+from config import AMADEUS_MAX_RESULTS, AMADEUS_RECORD_MODE, AMADEUS_RECORD_PATH
+
+RECORD_MODES = ("off", "record", "replay")
+
+
+class ReplayMissError(AmadeusError):
+    """Raised in replay mode when no response was recorded for a request."""
+
+
+class ResponseStore:
+    def __init__(self, path):
+        """
+        SQLite store of raw Amadeus responses, zlib-compressed and keyed by
+        the canonical JSON of the request parameters.
+        :param path: SQLite database file, created if missing.
+        """
+        self.path = path
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "request_key TEXT PRIMARY KEY, body BLOB NOT NULL, recorded_at REAL NOT NULL)"
+            )
+
+    @staticmethod
+    def request_key(params):
+        return json.dumps(params, sort_keys=True, separators=(",", ":"))
+
+    def get(self, params):
+        """Return the recorded response body for params, or None."""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT body FROM responses WHERE request_key = ?", (self.request_key(params),)
+            ).fetchone()
+        if row is None:
+            return None
+        return json.loads(zlib.decompress(row[0]))
+
+    def put(self, params, body):
+        """Record a response body, replacing any earlier recording of the same request."""
+        blob = zlib.compress(json.dumps(body, separators=(",", ":")).encode("utf-8"))
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO responses (request_key, body, recorded_at) VALUES (?, ?, ?)",
+                (self.request_key(params), blob, time.time()),
+            )
+
+    def count(self):
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_response_store():
+    """Return the process-wide ResponseStore at AMADEUS_RECORD_PATH, opening it on first use."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ResponseStore(AMADEUS_RECORD_PATH)
+        return _store
+
+
+def fetch_flight_offers(origin, destination, departure_date, currency="USD", mode=AMADEUS_RECORD_MODE,
+                        max_results=AMADEUS_MAX_RESULTS, non_stop=False):
+    """
+    Fetch the flight offers for one leg, honouring AMADEUS_RECORD_MODE:
+    "record" saves every raw response to the store, "replay" answers only from
+    the store without touching the network, and "off" calls Amadeus directly.
+    Responses are stored per query, so a non-stop query only replays non-stop recordings.
+    """
+    if mode not in RECORD_MODES:
+        raise ValueError(f"Unknown AMADEUS_RECORD_MODE: {mode}")
+
+    params = flight_offer_params(origin, destination, departure_date, currency, max_results, non_stop)
+    if mode == "replay":
+        body = get_response_store().get(params)
+        if body is None:
+            raise ReplayMissError(f"No recorded response for {origin} -> {destination} on {departure_date}")
+        return body.get("data", [])
+
+    body = get_amadeus_client().search_flight_offers(params)
+    if mode == "record":
+        get_response_store().put(params, body)
+    return body.get("data", [])
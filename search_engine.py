@@ -0,0 +1,317 @@
+import itertools
+import logging
+import math
+from datetime import timedelta
+
+from amadeus_errors import AmadeusError
+from config import SEARCH_STRATEGY, STREAM_PROGRESS_EVERY
+from destinations import buffer_hours, EXTRA_TRAVEL_TIME
+from metrics import SEQUENCES_EVALUATED, SEQUENCES_FEASIBLE
+from prefetch import plan_layer_legs, prefetch_legs, prefetch_search
+from rate_limiter import DeadlineExceededError, amadeus_scheduler
+
+logger = logging.getLogger(__name__)
+
+# Beam widths of the successive anytime_search passes; None keeps every label.
+ANYTIME_BEAM_WIDTHS = (1, 8, 64, None)
+
+
+def format_itinerary(itinerary):
+    """Return each flight of an itinerary followed by its totals, one line each."""
+    lines = []
+    for flight in itinerary["flights"]:
+        layover_str = f" | Layover in {flight['layover_iata']}: {flight['layover']}" if flight.get("layover") else ""
+        lines.append(f"{flight['origin']} -> {flight['destination']} | {flight['airline']} {flight['flight_number']} | "
+                     f"Departure: {flight['departure_time']} | Arrival: {flight['arrival_time']} | Duration: {flight['duration']} | "
+                     f"Cost: ${flight['cost']}{layover_str}")
+    lines.append(f"Total Flight Duration: {itinerary['total_flight_duration']}")
+    lines.append(f"Total Layover Duration: {itinerary['total_layover_duration']}")
+    lines.append(f"Total Travel Time: {itinerary['total_travel_time']}")
+    lines.append(f"Total Flight Cost: ${itinerary['total_cost']:.2f}")
+    return lines
+
+
+def print_itinerary(itinerary):
+    """Print each flight of an itinerary followed by its totals."""
+    print("\n".join(format_itinerary(itinerary)))
+
+
+def iter_itineraries(flight_instance, start_origin, layers, start_time):
+    """Yield (sequence, itinerary or None) for every sequence, in itertools.product order."""
+    for sequence in itertools.product(*layers):
+        yield sequence, flight_instance.simulate_itinerary(start_origin, sequence, start_time)
+
+
+def exhaustive_search(flight_instance, start_origin, layers, start_time, progress=None):
+    """
+    Simulate every sequence in the cartesian product of the layers and return
+    (best_sequence, best_itinerary) by shortest total travel time, or None.
+    Every leg the sequences can reach is prefetched in parallel first.
+    progress, if given, is called as progress(evaluated, total, best) after each sequence.
+    """
+    prefetch_search(flight_instance, start_origin, layers, start_time)
+
+    total = math.prod(len(layer) for layer in layers)
+    best = None
+    sequence_count = 0
+    feasible = 0
+
+    for sequence, itinerary in iter_itineraries(flight_instance, start_origin, layers, start_time):
+        sequence_count += 1
+        logger.debug("Checking sequence %d: %s", sequence_count, sequence)
+        if itinerary:
+            feasible += 1
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Itinerary found:\n%s", "\n".join(format_itinerary(itinerary)))
+            # Strictly shorter only, so ties keep the earlier sequence like min() does.
+            if best is None or itinerary["total_travel_time"] < best[1]["total_travel_time"]:
+                best = (sequence, itinerary)
+        else:
+            logger.debug("No valid itinerary for sequence %s", sequence)
+        if progress:
+            progress(sequence_count, total, best)
+
+    SEQUENCES_EVALUATED.inc(sequence_count, strategy="exhaustive")
+    SEQUENCES_FEASIBLE.inc(feasible, strategy="exhaustive")
+    return best
+
+
+def stream_search_events(flight_instance, start_origin, layers, start_time, progress_every=STREAM_PROGRESS_EVERY):
+    """
+    Evaluate sequences one by one and yield event dicts as soon as they are known:
+    "itinerary" for each feasible sequence, "best" whenever the best one improves,
+    "progress" every progress_every sequences and a final "done". Only the current
+    best itinerary is kept in memory.
+    """
+    total = math.prod(len(layer) for layer in layers)
+    best = None
+    evaluated = 0
+    feasible = 0
+
+    for sequence, itinerary in iter_itineraries(flight_instance, start_origin, layers, start_time):
+        evaluated += 1
+        if itinerary:
+            feasible += 1
+            yield {"event": "itinerary", "sequence": sequence, "itinerary": itinerary}
+            if best is None or itinerary["total_travel_time"] < best[1]["total_travel_time"]:
+                best = (sequence, itinerary)
+                yield {"event": "best", "sequence": sequence, "itinerary": itinerary}
+        if evaluated % progress_every == 0 and evaluated < total:
+            yield {
+                "event": "progress",
+                "sequences_evaluated": evaluated,
+                "sequences_total": total,
+                "sequences_feasible": feasible,
+                "best_total_travel_time": best[1]["total_travel_time"] if best else None,
+            }
+
+    SEQUENCES_EVALUATED.inc(evaluated, strategy="stream")
+    SEQUENCES_FEASIBLE.inc(feasible, strategy="stream")
+    yield {
+        "event": "done",
+        "sequences_evaluated": evaluated,
+        "sequences_total": total,
+        "sequences_feasible": feasible,
+        "best_sequence": best[0] if best else None,
+        "best_itinerary": best[1] if best else None,
+    }
+
+
+class _Label:
+    """Best way found so far to arrive at one airport of a layer at one arrival time."""
+
+    __slots__ = ("airport", "arrival_time", "parent", "flight", "path", "count",
+                 "total_flight_duration", "total_layover_duration", "total_cost")
+
+    def __init__(self, airport, arrival_time, parent=None, flight=None, path=(), count=1,
+                 total_flight_duration=timedelta(), total_layover_duration=timedelta(), total_cost=0.0):
+        self.airport = airport
+        self.arrival_time = arrival_time
+        self.parent = parent
+        self.flight = flight
+        self.path = path
+        # Number of sequence prefixes that reach this (airport, arrival time).
+        self.count = count
+        self.total_flight_duration = total_flight_duration
+        self.total_layover_duration = total_layover_duration
+        self.total_cost = total_cost
+
+    def rank(self):
+        # Ties go to the sequence that comes first in itertools.product order,
+        # which is the one min() picks in exhaustive_search.
+        return self.total_flight_duration + self.total_layover_duration, self.path
+
+
+def _layered_pass(flight_instance, start_origin, layers, start_time, beam_width=None, deadline=None, progress=None):
+    """
+    One earliest-arrival pass over the layers, as described in layered_search.
+    beam_width keeps only that many best labels per layer, the sequences behind
+    the others going unexplored. Legs that would start fetching after deadline,
+    a time.monotonic() value, are not prefetched; the pass still evaluates every
+    leg already cached and raises DeadlineExceededError at the first one that is not.
+    Returns (labels, evaluated, pruned): the final labels, best first and empty when
+    no explored sequence is feasible, the full sequences ruled out or completed,
+    and whether the beam dropped any label.
+    """
+    total = math.prod(len(layer) for layer in layers)
+    evaluated = 0
+    pruned = False
+    labels = [_Label(start_origin, start_time)]
+
+    for depth, layer in enumerate(layers):
+        states = {(label.airport, label.arrival_time) for label in labels}
+        prefetch_legs(flight_instance, plan_layer_legs(states, layer), priority=depth, deadline=deadline)
+        next_labels = {}
+        for label in labels:
+            min_departure_time = label.arrival_time + timedelta(hours=buffer_hours[label.airport])
+            for index, destination in enumerate(layer):
+                flight = flight_instance.get_earliest_direct_flight(label.airport, destination, min_departure_time)
+                if not flight:
+                    continue
+                layover_duration = flight['departure_time'] - label.arrival_time
+                candidate = _Label(
+                    destination,
+                    flight['arrival_time'],
+                    parent=label,
+                    flight={**flight, "layover": layover_duration, "layover_iata": label.airport},
+                    path=label.path + (index,),
+                    count=label.count,
+                    total_flight_duration=label.total_flight_duration + flight['duration'],
+                    total_layover_duration=label.total_layover_duration + layover_duration,
+                    total_cost=label.total_cost + flight['cost'],
+                )
+                key = (destination, candidate.arrival_time)
+                incumbent = next_labels.get(key)
+                if incumbent is None:
+                    next_labels[key] = candidate
+                    continue
+                candidate.count += incumbent.count
+                if candidate.rank() < incumbent.rank():
+                    next_labels[key] = candidate
+                else:
+                    incumbent.count = candidate.count
+
+        # Every prefix that died in this layer rules out all of its completions.
+        reached = sum(label.count for label in labels) * len(layer)
+        survived = sum(label.count for label in next_labels.values())
+        evaluated += (reached - survived) * math.prod(len(rest) for rest in layers[depth + 1:])
+
+        if not next_labels:
+            return [], evaluated, pruned
+        labels = sorted(next_labels.values(), key=_Label.rank)
+        if beam_width is not None and len(labels) > beam_width:
+            labels = labels[:beam_width]
+            pruned = True
+        if progress and depth < len(layers) - 1:
+            progress(evaluated, total, None)
+
+    return labels, evaluated + sum(label.count for label in labels), pruned
+
+
+def _label_result(label):
+    """Build the (best_sequence, best_itinerary) that ends in a final-layer label."""
+    flights = []
+    best = label
+    while label.parent is not None:
+        flights.append(label.flight)
+        label = label.parent
+    flights.reverse()
+
+    best_sequence = tuple(flight['destination'] for flight in flights)
+    best_itinerary = {
+        "flights": flights,
+        "total_flight_duration": best.total_flight_duration,
+        "total_layover_duration": best.total_layover_duration,
+        "total_travel_time": best.total_flight_duration + best.total_layover_duration + EXTRA_TRAVEL_TIME,
+        "total_cost": best.total_cost
+    }
+    return best_sequence, best_itinerary
+
+
+def layered_search(flight_instance, start_origin, layers, start_time, progress=None):
+    """
+    Earliest-arrival dynamic program over the continent layers.
+
+    simulate_itinerary always takes the earliest feasible departure after the
+    buffer, so everything after a stop depends only on where and when we landed
+    there. Each layer therefore keeps one label per (airport, arrival time),
+    holding the cheapest-so-far prefix with a back-pointer to the previous layer.
+    Each leg is evaluated once per label instead of once per full sequence, so the
+    cost is the sum of adjacent layer-size products rather than their product.
+    The legs for each layer are prefetched in parallel before the layer is evaluated.
+    Returns the same (best_sequence, best_itinerary) as exhaustive_search, or None.
+
+    progress, if given, is called as progress(evaluated, total, best) after each
+    layer, where evaluated counts the full sequences already ruled out or completed.
+    """
+    total = math.prod(len(layer) for layer in layers)
+    labels, _, _ = _layered_pass(flight_instance, start_origin, layers, start_time, progress=progress)
+    SEQUENCES_EVALUATED.inc(total, strategy="layered")
+    if not labels:
+        if progress:
+            progress(total, total, None)
+        return None
+
+    SEQUENCES_FEASIBLE.inc(sum(label.count for label in labels), strategy="layered")
+    logger.debug("Layered search kept %d final labels", len(labels))
+    best = _label_result(labels[0])
+    if progress:
+        progress(total, total, best)
+    return best
+
+
+def anytime_search(flight_instance, start_origin, layers, start_time, deadline, beam_widths=ANYTIME_BEAM_WIDTHS):
+    """
+    layered_search under a deadline, a time.monotonic() value after which no new
+    leg fetch starts. Runs layered passes that keep the 1, 8, 64 and finally all
+    best labels per layer, so a complete itinerary is known after the first pass
+    and each wider pass mostly reuses legs already fetched. When the deadline cuts
+    a pass short, the best itinerary of the earlier passes is returned. Every Amadeus
+    call of the search, retries included, is bound to the deadline.
+    Returns (result, coverage): (best_sequence, best_itinerary) or None, and a dict
+    with "complete" (the search was exhaustive, so the result equals layered_search's),
+    the passes finished, their last beam width, the sequences they covered and what
+    stopped an incomplete search ("deadline", or "amadeus_error" when a leg could
+    not be fetched, which also ends the search with the best itinerary so far).
+    """
+    total = math.prod(len(layer) for layer in layers)
+    best = None
+    coverage = {"complete": False, "passes": 0, "beam_width": None,
+                "sequences_evaluated": 0, "sequences_total": total, "stopped_by": None}
+    for beam_width in beam_widths:
+        try:
+            with amadeus_scheduler.bind(deadline=deadline):
+                labels, evaluated, pruned = _layered_pass(
+                    flight_instance, start_origin, layers, start_time, beam_width=beam_width, deadline=deadline
+                )
+        except DeadlineExceededError:
+            coverage["stopped_by"] = "deadline"
+            break
+        except AmadeusError as error:
+            logger.warning("Search stopped by an Amadeus error: %s", error)
+            coverage["stopped_by"] = "amadeus_error"
+            break
+        if labels and (best is None or labels[0].rank() < best.rank()):
+            best = labels[0]
+        coverage.update(passes=coverage["passes"] + 1, beam_width=beam_width, sequences_evaluated=evaluated)
+        if not pruned:
+            coverage["complete"] = True
+            break
+
+    SEQUENCES_EVALUATED.inc(coverage["sequences_evaluated"], strategy="anytime")
+    if coverage["stopped_by"] == "deadline":
+        logger.info("Search stopped at its deadline", extra=coverage)
+    return (_label_result(best) if best else None), coverage
+
+
+SEARCH_STRATEGIES = {
+    "layered": layered_search,
+    "exhaustive": exhaustive_search,
+}
+
+
+def find_best_itinerary(flight_instance, start_origin, layers, start_time, strategy=SEARCH_STRATEGY, progress=None):
+    """Run the configured search strategy and return (best_sequence, best_itinerary) or None."""
+    if strategy not in SEARCH_STRATEGIES:
+        raise ValueError(f"Unknown search strategy: {strategy}")
+    return SEARCH_STRATEGIES[strategy](flight_instance, start_origin, layers, start_time, progress=progress)
@@ -0,0 +1,123 @@
+import logging
+import queue
+import threading
+import time
+import uuid
+
+from config import SEARCH_JOB_QUEUE_DEPTH, SEARCH_JOB_RETENTION_SECONDS, SEARCH_JOB_WORKERS
+
+logger = logging.getLogger(__name__)
+
+
+class JobQueueFullError(Exception):
+    """Raised when no more search jobs can be queued."""
+
+
+class SearchJob:
+    def __init__(self, key, params):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.params = params
+        self.status = "queued"  # queued, running, succeeded or failed
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.evaluated = 0
+        self.total = None
+        self.best = None
+        self.result = None
+        self.error = None
+
+    @property
+    def done(self):
+        return self.status in ("succeeded", "failed")
+
+    def update_progress(self, evaluated, total, best):
+        self.evaluated = evaluated
+        self.total = total
+        if best is not None:
+            self.best = best
+
+
+class SearchJobManager:
+    def __init__(self, run_search, workers=SEARCH_JOB_WORKERS, queue_depth=SEARCH_JOB_QUEUE_DEPTH,
+                 retention_seconds=SEARCH_JOB_RETENTION_SECONDS):
+        """
+        Run flight searches on background threads.
+        :param run_search: Called as run_search(params, progress) on a worker thread;
+            progress(evaluated, total, best) may be called while it runs and its
+            return value becomes the job result.
+        :param workers: Number of worker threads.
+        :param queue_depth: Maximum number of jobs waiting for a worker.
+        :param retention_seconds: How long finished jobs stay available for polling.
+        """
+        self.run_search = run_search
+        self.workers = workers
+        self.retention_seconds = retention_seconds
+        self._queue = queue.Queue(maxsize=queue_depth)
+        self._jobs = {}
+        self._pending_by_key = {}
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def _ensure_workers(self):
+        """Start the worker threads on first submit. Caller holds the lock."""
+        if self._threads:
+            return
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"search-job-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _prune(self, now):
+        """Forget finished jobs past their retention period. Caller holds the lock."""
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.done and now - job.finished_at > self.retention_seconds
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def submit(self, key, params):
+        """
+        Queue a search and return (job, created). An identical queued or running
+        search is returned instead of starting a new one, with created set to False.
+        """
+        with self._lock:
+            self._prune(time.time())
+            existing = self._pending_by_key.get(key)
+            if existing is not None:
+                return existing, False
+
+            job = SearchJob(key, params)
+            try:
+                self._queue.put_nowait(job)
+            except queue.Full:
+                raise JobQueueFullError("Too many searches are queued. Please try again later.")
+            self._jobs[job.id] = job
+            self._pending_by_key[key] = job
+            self._ensure_workers()
+            return job, True
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            job.status = "running"
+            job.started_at = time.time()
+            try:
+                job.result = self.run_search(job.params, job.update_progress)
+                job.status = "succeeded"
+            except Exception as error:
+                logger.exception("Search job %s failed", job.id, extra={"job_id": job.id})
+                job.error = str(error)
+                job.status = "failed"
+            finally:
+                job.finished_at = time.time()
+                with self._lock:
+                    if self._pending_by_key.get(job.key) is job:
+                        del self._pending_by_key[job.key]
+                self._queue.task_done()
@@ -0,0 +1,66 @@
+import datetime
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+JSON_MIMETYPE = "application/json"
+MSGPACK_MIMETYPES = ("application/msgpack", "application/x-msgpack")
+
+
+def encode_default(obj):
+    """v2 encoding of the values JSON has no type for: ISO 8601 times and integer seconds."""
+    if isinstance(obj, datetime.datetime):
+        return obj.isoformat()
+    if isinstance(obj, datetime.timedelta):
+        return int(obj.total_seconds())
+    if isinstance(obj, (set, frozenset)):
+        return sorted(obj)
+    raise TypeError(f"Type not serializable: {type(obj).__name__}")
+
+
+# Built once and reused for every response.
+_json_encoder = json.JSONEncoder(default=encode_default, separators=(",", ":"), ensure_ascii=False)
+
+
+def dumps_json(obj):
+    """Encode obj as compact v2 JSON bytes, with orjson when it is installed."""
+    if orjson is not None:
+        # orjson writes datetimes itself and only calls encode_default for timedeltas and sets.
+        return orjson.dumps(obj, default=encode_default)
+    return _json_encoder.encode(obj).encode("utf-8")
+
+
+def dumps_msgpack(obj):
+    """Encode obj as MessagePack with the same value conventions as dumps_json."""
+    return msgpack.packb(obj, default=encode_default, use_bin_type=True)
+
+
+def available_mimetypes():
+    """Response types v2 can produce, preferred first; MessagePack only when msgpack is installed."""
+    if msgpack is None:
+        return (JSON_MIMETYPE,)
+    return (JSON_MIMETYPE,) + MSGPACK_MIMETYPES
+
+
+def negotiate(accept_mimetypes):
+    """
+    Pick the v2 response type for a request's Accept header.
+    Returns (mimetype, encoder), or (None, None) when nothing acceptable can be produced.
+    """
+    if not accept_mimetypes:
+        # No Accept header means anything goes.
+        return JSON_MIMETYPE, dumps_json
+    mimetype = accept_mimetypes.best_match(available_mimetypes())
+    if mimetype is None:
+        return None, None
+    if mimetype in MSGPACK_MIMETYPES:
+        return mimetype, dumps_msgpack
+    return mimetype, dumps_json
@@ -0,0 +1,266 @@
+import json
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import uuid
+
+from config import (
+    OFFER_CACHE_TTL_SECONDS,
+    SHARED_CACHE_COMPACT_INTERVAL_SECONDS,
+    SHARED_CACHE_LEASE_SECONDS,
+    SHARED_CACHE_MAX_ENTRIES,
+    SHARED_CACHE_PATH,
+)
+from cache import offer_ttl
+from metrics import CACHE_ENTRIES, CACHE_HIT_RATIO, CACHE_HITS, CACHE_MISSES, registry
+
+logger = logging.getLogger(__name__)
+
+
+class SharedCache:
+    def __init__(self, path, ttl_seconds, max_entries, lease_seconds=SHARED_CACHE_LEASE_SECONDS,
+                 compact_interval_seconds=SHARED_CACHE_COMPACT_INTERVAL_SECONDS, poll_seconds=0.05, ttl_for=None):
+        """
+        Cache shared by every process on the host through a SQLite file in WAL mode.
+        Values are pickled, so the file must only ever be written by this app.
+        A miss takes a lease on the key before loading it, so however many workers
+        miss at once, only one of them calls the loader and the rest wait for its row.
+        Leases are renewed while their load runs, however long the Amadeus retries and
+        rate-limiter queue make it, and lapse lease_seconds after their process dies.
+        :param path: SQLite database file, created if missing.
+        :param ttl_seconds: How long an entry stays fresh, in seconds.
+        :param max_entries: Entries kept by compaction; the ones expiring soonest go first.
+        :param lease_seconds: How long a lease outlives its last renewal before others take over the key.
+        :param compact_interval_seconds: Seconds between background compactions.
+        :param poll_seconds: How often a waiting worker checks whether the key has been filled.
+        :param ttl_for: Optional function of a stored value returning its TTL, overriding ttl_seconds.
+        """
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.lease_seconds = lease_seconds
+        self.compact_interval_seconds = compact_interval_seconds
+        self.poll_seconds = poll_seconds
+        self.ttl_for = ttl_for
+        self.hits = 0
+        self.misses = 0
+        self._owner = None
+        self._pid = None
+        self._connection = None
+        self._compactor = None
+        self._renewer = None
+        self._loading = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def cache_key(key):
+        return json.dumps(key, separators=(",", ":"))
+
+    def _connect(self):
+        """Return this process's connection, reopening it after a fork. Caller holds the lock."""
+        if self._pid != os.getpid():
+            # A connection inherited from the parent process must not be used, or closed, here.
+            self._connection = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "cache_key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS leases ("
+                "cache_key TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._pid = os.getpid()
+            # Leases name their process, so a forked worker never mistakes its parent's lease for its own.
+            self._owner = uuid.uuid4().hex
+            self._compactor = None
+            self._renewer = None
+            self._loading = 0
+        if self._compactor is None:
+            self._compactor = threading.Thread(target=self._compact_periodically, name="shared-cache-compaction",
+                                               daemon=True)
+            self._compactor.start()
+        if self._renewer is None:
+            self._renewer = threading.Thread(target=self._renew_leases_periodically, name="shared-cache-leases",
+                                             daemon=True)
+            self._renewer.start()
+        return self._connection
+
+    def _read(self, cache_key):
+        """Return (True, value) for a fresh entry."""
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT value FROM entries WHERE cache_key = ? AND expires_at > ?", (cache_key, time.time())
+            ).fetchone()
+        if row is None:
+            return False, None
+        return True, pickle.loads(row[0])
+
+    def _acquire(self, cache_key):
+        """Take the fill lease on a key unless another live loader holds it."""
+        now = time.time()
+        with self._lock:
+            connection = self._connect()
+            connection.execute("BEGIN IMMEDIATE")
+            with connection:
+                connection.execute("DELETE FROM leases WHERE cache_key = ? AND expires_at <= ?", (cache_key, now))
+                acquired = connection.execute(
+                    "INSERT OR IGNORE INTO leases (cache_key, owner, expires_at) VALUES (?, ?, ?)",
+                    (cache_key, self._owner, now + self.lease_seconds),
+                ).rowcount == 1
+        return acquired
+
+    def _leased(self, cache_key):
+        with self._lock:
+            return self._connect().execute(
+                "SELECT 1 FROM leases WHERE cache_key = ? AND expires_at > ?", (cache_key, time.time())
+            ).fetchone() is not None
+
+    def _fill(self, cache_key, value, ttl_seconds=None):
+        """Store a loaded value and give up the lease on its key in one transaction."""
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if ttl_seconds is None:
+            ttl_seconds = self.ttl_for(value) if self.ttl_for else self.ttl_seconds
+        with self._lock:
+            connection = self._connect()
+            connection.execute("BEGIN IMMEDIATE")
+            with connection:
+                connection.execute(
+                    "INSERT OR REPLACE INTO entries (cache_key, value, expires_at) VALUES (?, ?, ?)",
+                    (cache_key, blob, time.time() + ttl_seconds),
+                )
+                connection.execute("DELETE FROM leases WHERE cache_key = ? AND owner = ?", (cache_key, self._owner))
+
+    def renew_leases(self):
+        """Push back the expiry of every lease this process holds for a running load."""
+        with self._lock:
+            if self._loading:
+                self._connect().execute("UPDATE leases SET expires_at = ? WHERE owner = ?",
+                                        (time.time() + self.lease_seconds, self._owner))
+
+    def _renew_leases_periodically(self):
+        while True:
+            time.sleep(self.lease_seconds / 3)
+            try:
+                self.renew_leases()
+            except sqlite3.Error as error:
+                logger.warning("Shared cache lease renewal failed: %s", error)
+
+    def _release(self, cache_key):
+        with self._lock:
+            self._connect().execute("DELETE FROM leases WHERE cache_key = ? AND owner = ?", (cache_key, self._owner))
+
+    def get_or_load(self, key, loader, ttl_seconds=None, timeout=None):
+        """
+        Return the shared value for key, calling loader() on a miss.
+        While another worker holds the lease on key this waits for its row, and
+        takes over the load if that worker fails or its lease runs out. If
+        loader() raises, the lease is released, nothing is stored and the
+        error propagates. ttl_seconds, if given, overrides the TTL of a loaded value.
+        timeout, if given, is how many seconds to wait on another worker's lease
+        before raising TimeoutError.
+        """
+        cache_key = self.cache_key(key)
+        found, value = self._read(cache_key)
+        if found:
+            self.hits += 1
+            return value
+        self.misses += 1
+
+        give_up_at = None if timeout is None else time.monotonic() + timeout
+        while not self._acquire(cache_key):
+            while self._leased(cache_key):
+                wait_seconds = self.poll_seconds
+                if give_up_at is not None:
+                    wait_seconds = min(wait_seconds, give_up_at - time.monotonic())
+                    if wait_seconds <= 0:
+                        raise TimeoutError(f"Gave up waiting for the shared cache lease on {key!r}")
+                time.sleep(wait_seconds)
+            found, value = self._read(cache_key)
+            if found:
+                return value
+
+        with self._lock:
+            self._loading += 1
+        try:
+            value = loader()
+        except BaseException:
+            self._release(cache_key)
+            raise
+        else:
+            self._fill(cache_key, value, ttl_seconds)
+        finally:
+            with self._lock:
+                self._loading -= 1
+        return value
+
+    def compact(self):
+        """Drop expired entries and stale leases, trim to max_entries and checkpoint the WAL."""
+        now = time.time()
+        with self._lock:
+            connection = self._connect()
+            expired = connection.execute("DELETE FROM entries WHERE expires_at <= ?", (now,)).rowcount
+            connection.execute("DELETE FROM leases WHERE expires_at <= ?", (now,))
+            trimmed = connection.execute(
+                "DELETE FROM entries WHERE cache_key IN ("
+                "SELECT cache_key FROM entries ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            ).rowcount
+            connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        if expired or trimmed:
+            logger.debug("Compacted shared cache", extra={"expired": expired, "trimmed": trimmed})
+
+    def _compact_periodically(self):
+        while True:
+            time.sleep(self.compact_interval_seconds)
+            try:
+                self.compact()
+            except sqlite3.Error as error:
+                logger.warning("Shared cache compaction failed: %s", error)
+
+    def clear(self):
+        with self._lock:
+            connection = self._connect()
+            connection.execute("DELETE FROM entries")
+            connection.execute("DELETE FROM leases")
+
+    def stats(self):
+        """Return this process's hit/miss counters and the number of shared entries."""
+        with self._lock:
+            size = self._connect().execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": (self.hits / lookups) if lookups else 0.0,
+            "size": size,
+        }
+
+
+_shared_offer_cache = None
+_shared_offer_cache_lock = threading.Lock()
+
+
+def collect_shared_cache_metrics():
+    stats = _shared_offer_cache.stats()
+    CACHE_HITS.set(stats["hits"], cache="shared_offers")
+    CACHE_MISSES.set(stats["misses"], cache="shared_offers")
+    CACHE_HIT_RATIO.set(stats["hit_ratio"], cache="shared_offers")
+    CACHE_ENTRIES.set(stats["size"], cache="shared_offers")
+
+
+def get_shared_offer_cache():
+    """Return the host-wide offer cache at SHARED_CACHE_PATH, or None when SHARED_CACHE_PATH is unset."""
+    global _shared_offer_cache
+    if not SHARED_CACHE_PATH:
+        return None
+    with _shared_offer_cache_lock:
+        if _shared_offer_cache is None:
+            _shared_offer_cache = SharedCache(SHARED_CACHE_PATH, OFFER_CACHE_TTL_SECONDS, SHARED_CACHE_MAX_ENTRIES,
+                                              ttl_for=offer_ttl)
+            registry.add_collector(collect_shared_cache_metrics)
+        return _shared_offer_cache
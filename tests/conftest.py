@@ -0,0 +1,36 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+# Settings are read at import time; keep every test in-process and off the network.
+os.environ.setdefault("AMADEUS_API_KEY", "test")
+os.environ.setdefault("AMADEUS_API_SECRET", "test")
+os.environ["AMADEUS_RECORD_MODE"] = "off"
+os.environ["SHARED_CACHE_PATH"] = ""
+os.environ["AMADEUS_QUOTA_PATH"] = ""
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+
+@pytest.fixture
+def fake_amadeus(monkeypatch):
+    """
+    Factory installing a FakeAmadeusClient over a seeded Timetable as the process-wide
+    Amadeus client, with an empty offer cache.
+    """
+    import amadeus_client
+    from cache import offer_cache
+    from mock_amadeus import FakeAmadeusClient, Timetable
+
+    def install(seed=0):
+        client = FakeAmadeusClient(Timetable(seed=seed))
+        monkeypatch.setattr(amadeus_client, "_client", client)
+        offer_cache.clear()
+        return client
+
+    yield install
+    offer_cache.clear()
@@ -0,0 +1,95 @@
+import threading
+import time
+
+import pytest
+
+from cache import TTLCache
+
+
+def test_concurrent_misses_share_one_load():
+    cache = TTLCache(ttl_seconds=60, max_entries=10)
+    calls = []
+    started = threading.Event()
+
+    def loader():
+        calls.append(True)
+        started.set()
+        time.sleep(0.2)
+        return "offers"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_load("leg", loader))) for _ in range(8)]
+    threads[0].start()
+    started.wait()
+    for thread in threads[1:]:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert calls == [True]
+    assert results == ["offers"] * 8
+    assert cache.get("leg") == "offers"
+
+
+def test_failed_load_reaches_waiters_and_is_not_cached():
+    cache = TTLCache(ttl_seconds=60, max_entries=10)
+    started = threading.Event()
+
+    def loader():
+        started.set()
+        time.sleep(0.1)
+        raise ValueError("Amadeus is down")
+
+    errors = []
+
+    def load():
+        try:
+            cache.get_or_load("leg", loader)
+        except ValueError as error:
+            errors.append(error)
+
+    owner = threading.Thread(target=load)
+    owner.start()
+    started.wait()
+    waiter = threading.Thread(target=load)
+    waiter.start()
+    owner.join()
+    waiter.join()
+
+    assert len(errors) == 2
+    assert not cache.contains("leg")
+    assert cache.get_or_load("leg", lambda: "offers") == "offers"
+
+
+def test_waiter_gives_up_after_its_timeout():
+    cache = TTLCache(ttl_seconds=60, max_entries=10)
+    started = threading.Event()
+    owner = threading.Thread(target=cache.get_or_load, args=("leg", lambda: started.set() or time.sleep(0.5) or 1))
+    owner.start()
+    started.wait()
+    with pytest.raises(TimeoutError):
+        cache.get_or_load("leg", lambda: 2, timeout=0.05)
+    owner.join()
+    assert cache.get("leg") == 1
+
+
+def test_entries_expire_and_ttl_can_be_overridden():
+    # Like the offer cache, empty values are kept for a shorter time.
+    cache = TTLCache(ttl_seconds=60, max_entries=10, ttl_for=lambda value: 60 if value else 0.05)
+    cache.get_or_load("empty", lambda: [])
+    cache.get_or_load("full", lambda: [1])
+    cache.get_or_load("short", lambda: [2], ttl_seconds=0.05)
+    time.sleep(0.1)
+    assert not cache.contains("empty")
+    assert cache.contains("full")
+    assert not cache.contains("short")
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = TTLCache(ttl_seconds=60, max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.contains("a") and cache.contains("c")
+    assert not cache.contains("b")
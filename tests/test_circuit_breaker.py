@@ -0,0 +1,75 @@
+import time
+
+import pytest
+
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+
+
+def open_breaker(open_seconds=0.05, half_open_probes=1):
+    breaker = CircuitBreaker("test", failure_threshold=2, open_seconds=open_seconds, half_open_probes=half_open_probes)
+    for _ in range(2):
+        breaker.before_call()
+        breaker.record_failure()
+    return breaker
+
+
+def test_opens_after_threshold_failures_in_a_row():
+    breaker = CircuitBreaker("test", failure_threshold=2, open_seconds=60)
+    breaker.before_call()
+    breaker.record_failure()
+    breaker.before_call()
+    breaker.record_success()
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_half_open_lets_only_the_probe_limit_through():
+    breaker = open_breaker()
+    time.sleep(0.06)
+    assert breaker.state == HALF_OPEN
+
+    breaker.before_call()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_probe_success_closes_the_circuit():
+    breaker = open_breaker()
+    time.sleep(0.06)
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    breaker.before_call()
+    breaker.before_call()
+
+
+def test_probe_failure_reopens_the_circuit():
+    breaker = open_breaker()
+    time.sleep(0.06)
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_release_counts_neither_way():
+    breaker = CircuitBreaker("test", failure_threshold=1, open_seconds=60)
+    breaker.before_call()
+    breaker.release()
+    assert breaker.state == CLOSED
+
+    breaker = open_breaker()
+    time.sleep(0.06)
+    breaker.before_call()
+    breaker.release()
+    # The released probe frees its slot without closing or re-opening the circuit.
+    assert breaker.state == HALF_OPEN
+    breaker.before_call()
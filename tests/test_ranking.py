@@ -0,0 +1,67 @@
+from datetime import datetime
+
+import pytest
+import pytz
+
+from destinations import CONTINENT_LAYERS
+from engines import get_engine
+from ranking import Objective, ParetoFrontier, TopK, rank_itineraries
+from search_engine import iter_itineraries
+
+START = pytz.utc.localize(datetime(2025, 3, 15, 10, 0))
+
+
+def test_top_k_keeps_the_best_items_and_earlier_ties():
+    ranked = TopK(2)
+    for ordinal, score in enumerate([(5,), (3,), (3,), (9,), (1,)]):
+        ranked.push(score, ordinal, ordinal)
+    assert ranked.items() == [4, 1]
+    assert not ranked.admits((3,))
+    assert ranked.admits((2,))
+
+
+def test_pareto_frontier_drops_dominated_points():
+    frontier = ParetoFrontier()
+    for seconds, cost in [(10, 100), (20, 50), (15, 120), (30, 50), (5, 200), (20, 40), (10, 100)]:
+        frontier.add(seconds, cost, (seconds, cost))
+    assert frontier.items() == [(5, 200), (10, 100), (20, 40)]
+    assert frontier.dominated(25, 45)
+    assert not frontier.dominated(25, 30)
+
+
+def brute_force(engine):
+    """Every feasible (sequence, itinerary) in product order."""
+    return [(sequence, itinerary) for sequence, itinerary in iter_itineraries(engine, "PUQ", CONTINENT_LAYERS, START)
+            if itinerary]
+
+
+@pytest.mark.parametrize("objective_name", ["time", "cost", "weighted"])
+@pytest.mark.parametrize("seed", range(4))
+def test_top_k_matches_brute_force(fake_amadeus, seed, objective_name):
+    fake_amadeus(seed)
+    engine = get_engine("stops")
+    objective = Objective(objective_name)
+    feasible = brute_force(engine)
+    expected = sorted(range(len(feasible)), key=lambda index: (objective.itinerary_score(feasible[index][1]), index))
+
+    ranking = rank_itineraries(engine, "PUQ", CONTINENT_LAYERS, START, objective=objective, top_k=5)
+
+    assert len(feasible) > 1
+    assert [sequence for sequence, _ in ranking["ranked"]] == [feasible[index][0] for index in expected[:5]]
+    assert ranking["coverage"]["complete"]
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_pareto_matches_brute_force(fake_amadeus, seed):
+    fake_amadeus(seed)
+    engine = get_engine("stops")
+    points = [(itinerary["total_travel_time"].total_seconds(), itinerary["total_cost"])
+              for _, itinerary in brute_force(engine)]
+    expected = sorted({point for point in points
+                       if not any(other != point and other[0] <= point[0] and other[1] <= point[1]
+                                  for other in points)})
+
+    ranking = rank_itineraries(engine, "PUQ", CONTINENT_LAYERS, START, pareto=True)
+
+    assert [(itinerary["total_travel_time"].total_seconds(), itinerary["total_cost"])
+            for _, itinerary in ranking["pareto"]] == expected
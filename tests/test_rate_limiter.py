@@ -0,0 +1,75 @@
+import time
+
+import pytest
+
+from rate_limiter import AmadeusScheduler, DeadlineExceededError, QuotaExceededError
+
+
+def scheduler(**kwargs):
+    settings = {"requests_per_second": 20, "burst": 3, "daily_budget": 0, "max_wait_seconds": 5, "quota_path": ""}
+    return AmadeusScheduler(**{**settings, **kwargs})
+
+
+def test_burst_goes_out_at_once_then_at_the_sustained_rate():
+    limiter = scheduler()
+    started = time.monotonic()
+    for _ in range(3):
+        limiter.acquire()
+    assert time.monotonic() - started < 0.05
+    for _ in range(4):
+        limiter.acquire()
+    # Four more requests at 20 per second take about 0.2 s.
+    assert 0.15 <= time.monotonic() - started < 0.5
+    assert limiter.usage()["granted"] == 7
+
+
+def test_daily_budget_rejects_requests_once_used_up():
+    limiter = scheduler(daily_budget=2)
+    limiter.acquire()
+    limiter.acquire()
+    with pytest.raises(QuotaExceededError):
+        limiter.acquire()
+    usage = limiter.usage()
+    assert usage["used_today"] == 2 and usage["remaining_today"] == 0 and usage["rejected"] == 1
+
+
+def test_calls_are_counted_per_search():
+    limiter = scheduler()
+    with limiter.bind(search_id="a"):
+        limiter.acquire()
+        limiter.acquire()
+    with limiter.bind(search_id="b"):
+        limiter.acquire()
+    assert limiter.pop_search_calls("a") == 2
+    assert limiter.pop_search_calls("a") == 0
+    assert limiter.pop_search_calls("b") == 1
+
+
+def test_search_deadline_stops_waiting_for_a_slot():
+    limiter = scheduler(requests_per_second=1, burst=1)
+    limiter.acquire()
+    started = time.monotonic()
+    with limiter.bind(deadline=started + 0.1):
+        assert 0 < limiter.time_left() <= 0.1
+        with pytest.raises(DeadlineExceededError):
+            limiter.acquire()
+    assert time.monotonic() - started < 0.1
+    assert limiter.time_left() is None
+
+
+def test_shared_quota_holds_across_schedulers(tmp_path):
+    path = str(tmp_path / "quota.sqlite3")
+    first = scheduler(burst=2, daily_budget=3, quota_path=path)
+    second = scheduler(burst=2, daily_budget=3, quota_path=path)
+
+    started = time.monotonic()
+    first.acquire()
+    second.acquire()
+    # The two schedulers drew the shared burst of 2, so the next request waits for a token.
+    second.acquire()
+    assert time.monotonic() - started >= 0.03
+    with pytest.raises(QuotaExceededError):
+        first.acquire()
+
+    usage = first.usage()
+    assert usage["shared"] and usage["used_today"] == 3 and usage["remaining_today"] == 0
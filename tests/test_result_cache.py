@@ -0,0 +1,45 @@
+import pytest
+
+from app import app
+from cache import result_cache
+
+QUERY = {"start_origin": "PUQ", "departure_date": "2025-03-15", "departure_time": "10:00", "flight_type": "stops"}
+
+
+@pytest.fixture
+def client(fake_amadeus):
+    fake_amadeus(1)
+    result_cache.clear()
+    yield app.test_client()
+    result_cache.clear()
+
+
+def test_repeated_search_is_answered_from_the_result_cache(client):
+    first = client.get("/api/flights", query_string=QUERY)
+    assert first.status_code == 200 and first.get_json()["status"] == "SUCCESS"
+    assert first.headers["X-Cache"] == "MISS"
+    assert first.headers["Cache-Control"].startswith("public, max-age=")
+    assert "Accept" in first.headers["Vary"]
+
+    second = client.get("/api/flights", query_string=QUERY)
+    assert second.headers["X-Cache"] == "HIT"
+    assert second.headers["ETag"] == first.headers["ETag"]
+    assert second.data == first.data
+
+
+def test_matching_etag_gets_not_modified(client):
+    etag = client.get("/api/flights", query_string=QUERY).headers["ETag"]
+
+    response = client.get("/api/flights", query_string=QUERY, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.data == b""
+    assert response.headers["ETag"] == etag
+
+    response = client.get("/api/flights", query_string=QUERY, headers={"If-None-Match": '"stale"'})
+    assert response.status_code == 200
+
+
+def test_other_searches_get_their_own_entry(client):
+    client.get("/api/flights", query_string=QUERY)
+    assert client.get("/api/flights", query_string={**QUERY, "departure_time": "12:00"}).headers["X-Cache"] == "MISS"
+    assert client.get("/api/flights", query_string={**QUERY, "flight_type": "direct"}).headers["X-Cache"] == "MISS"
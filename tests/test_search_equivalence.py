@@ -0,0 +1,47 @@
+"""
+Every search strategy must pick the same best itinerary as simulating every
+sequence, across seeded synthetic timetables.
+"""
+import time
+from datetime import datetime
+
+import pytest
+import pytz
+
+from destinations import CONTINENT_LAYERS
+from engines import get_engine
+from ranking import rank_itineraries
+from search_engine import anytime_search, exhaustive_search, layered_search
+
+SEEDS = range(8)
+STARTS = [("PUQ", datetime(2025, 3, 15, 10, 0)), ("JFK", datetime(2025, 3, 16, 22, 30))]
+
+
+@pytest.mark.parametrize("mode", ["direct", "stops"])
+@pytest.mark.parametrize("seed", SEEDS)
+def test_strategies_agree(fake_amadeus, seed, mode):
+    fake_amadeus(seed)
+    engine = get_engine(mode)
+    for start_origin, start in STARTS:
+        start_time = pytz.utc.localize(start)
+        expected = exhaustive_search(engine, start_origin, CONTINENT_LAYERS, start_time)
+
+        assert layered_search(engine, start_origin, CONTINENT_LAYERS, start_time) == expected
+
+        result, coverage = anytime_search(engine, start_origin, CONTINENT_LAYERS, start_time, time.monotonic() + 600)
+        assert coverage["complete"]
+        assert coverage["sequences_evaluated"] == coverage["sequences_total"]
+        assert result == expected
+
+        ranking = rank_itineraries(engine, start_origin, CONTINENT_LAYERS, start_time)
+        assert (ranking["ranked"][0] if ranking["ranked"] else None) == expected
+
+
+def test_seeds_find_itineraries(fake_amadeus):
+    """Guard against a timetable so sparse that the equivalence checks only ever compare None."""
+    found = 0
+    for seed in SEEDS:
+        fake_amadeus(seed)
+        found += layered_search(get_engine("stops"), "PUQ", CONTINENT_LAYERS,
+                                pytz.utc.localize(datetime(2025, 3, 15, 10, 0))) is not None
+    assert found >= len(SEEDS) // 2
@@ -0,0 +1,44 @@
+import pytest
+
+from app import app, parse_search_params
+
+VALID = {"start_origin": "PUQ", "departure_date": "2026-01-10", "departure_time": "09:00"}
+
+
+def test_valid_search_params():
+    params, error = parse_search_params(VALID)
+    assert error is None
+    assert params["start_origin"] == "PUQ"
+    assert params["current_time"].tzinfo.zone == "America/Punta_Arenas"
+
+
+@pytest.mark.parametrize("start_origin", ["", "ZZZ", "ATL"])
+def test_unknown_origin_is_rejected(start_origin):
+    params, error = parse_search_params({**VALID, "start_origin": start_origin})
+    assert params is None and error
+
+
+@pytest.mark.parametrize("start_origin", ["ZZZ", "ATL"])
+def test_flights_rejects_invalid_params(start_origin):
+    response = app.test_client().get("/api/flights", query_string={**VALID, "start_origin": start_origin})
+    assert response.status_code == 400
+    assert response.get_json()["status"] == "FAILED"
+
+
+@pytest.mark.parametrize("field", ["start_origin", "departure_date", "departure_time", "flight_type", "objective"])
+def test_non_string_fields_are_rejected(field):
+    params, error = parse_search_params({**VALID, field: 123})
+    assert params is None and field in error
+
+
+def test_batch_reports_invalid_queries_per_query():
+    response = app.test_client().post("/api/flights/batch", json={"queries": [{**VALID, "start_origin": 123}]})
+    assert response.status_code == 200
+    assert response.get_json()["data"] == [{"status": "FAILED", "message": "start_origin must be a string."}]
+
+
+def test_unknown_flight_type_is_rejected():
+    params, error = parse_search_params({**VALID, "flight_type": "xyz"})
+    assert params is None and "flight_type" in error
+    response = app.test_client().get("/api/flights", query_string={**VALID, "flight_type": "xyz"})
+    assert response.status_code == 400
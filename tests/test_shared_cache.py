@@ -0,0 +1,64 @@
+import threading
+import time
+
+import pytest
+
+from shared_cache import SharedCache
+
+
+@pytest.fixture
+def make_cache(tmp_path):
+    """Factory for SharedCache instances over one file, each standing in for a separate worker."""
+    path = str(tmp_path / "shared.sqlite3")
+
+    def make(lease_seconds=30):
+        return SharedCache(path, ttl_seconds=60, max_entries=100, lease_seconds=lease_seconds, poll_seconds=0.01)
+    return make
+
+
+def test_value_loaded_by_one_worker_is_read_by_another(make_cache):
+    first, second = make_cache(), make_cache()
+    assert first.get_or_load(("PUQ", "SCL"), lambda: [1, 2]) == [1, 2]
+    assert second.get_or_load(("PUQ", "SCL"), lambda: pytest.fail("loaded twice")) == [1, 2]
+
+
+def test_lease_of_a_dead_worker_is_taken_over(make_cache):
+    crashed, survivor = make_cache(lease_seconds=0.2), make_cache(lease_seconds=0.2)
+    # A worker that took the lease and died never fills the key or renews the lease.
+    assert crashed._acquire(crashed.cache_key("leg"))
+
+    started = time.monotonic()
+    assert survivor.get_or_load("leg", lambda: "offers") == "offers"
+    assert time.monotonic() - started >= 0.15
+
+
+def test_waiter_gives_up_on_a_lease_after_its_timeout(make_cache):
+    holder, waiter = make_cache(), make_cache()
+    holder._acquire(holder.cache_key("leg"))
+    with pytest.raises(TimeoutError):
+        waiter.get_or_load("leg", lambda: "offers", timeout=0.05)
+
+
+def test_lease_is_renewed_while_a_slow_load_runs(make_cache):
+    loader_cache, waiter_cache = make_cache(lease_seconds=0.3), make_cache(lease_seconds=0.3)
+    started = threading.Event()
+    calls = []
+
+    def slow_load():
+        calls.append("loader")
+        started.set()
+        time.sleep(1.0)
+        return "offers"
+
+    loading = threading.Thread(target=loader_cache.get_or_load, args=("leg", slow_load))
+    loading.start()
+    started.wait()
+
+    def waiter_load():
+        calls.append("waiter")
+        return "reloaded"
+
+    # The load outlasts the lease three times over, but renewals keep the waiter from taking over.
+    assert waiter_cache.get_or_load("leg", waiter_load) == "offers"
+    loading.join()
+    assert calls == ["loader"]